@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from .endpoints import stations, data, testing
+from .endpoints import stations, data, surge, testing
 
 router = APIRouter(
     prefix="/api",
@@ -9,4 +9,5 @@ router = APIRouter(
 )
 
 router.include_router(stations.router)
-router.include_router(data.router)
\ No newline at end of file
+router.include_router(data.router)
+router.include_router(surge.router)
\ No newline at end of file
@@ -1,28 +1,79 @@
 # Required for redis
 import json
+import asyncio
+import logging
 import os
 import re
 import pendulum
-import utide
-import pandas as pd
-from numpy import ndarray
-from pathlib import Path
+import numpy as np
+from numpy import ndarray, datetime_as_string
 from typing import List, Optional, Sequence, Dict, Any, Union, cast
 
-from fastapi import Depends, HTTPException, APIRouter, Request
+from fastapi import Depends, HTTPException, APIRouter, Request, Query
+from fastapi.responses import StreamingResponse
 from pydantic import ValidationError
 from sqlalchemy import text, CursorResult
+from sqlalchemy.exc import ProgrammingError
 from sqlalchemy.engine import RowMapping
-import aiofiles
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncConnection
 from dotenv import load_dotenv
 
-from app.internal.utilities import json_to_utide_coef
-from app.dependencies.redis import get_redis
-from app.models import Reading, StationDataResponse, StationTableResponse
+from app.internal import coverage, highres, live, swr, tide_data
+from app.internal.admission import miss_limiter
+from app.internal.harmonics import predict
+from app.internal.tide_table import find_extremes, yearly_tide_table
+from app.internal.metrics import CACHE_OUTCOMES, stage
+from app.internal.queries import READINGS_QUERY
+from app.dependencies.redis import ResilientCache, get_cache, get_redis
+from app.models import Reading, StationDataResponse, StationTableResponse, StationExtremesResponse, StationPredictionResponse, StationCoverageResponse
 
 load_dotenv()
 CACHE_TIME_LIMIT:int = int(os.getenv("CACHE_TIME_LIMIT", 3600))
+EXTREMES_MAX_DAYS: int = int(os.getenv("EXTREMES_MAX_DAYS", 62))
+COVERAGE_MAX_DAYS: int = int(os.getenv("COVERAGE_MAX_DAYS", 366))
+PREDICTION_MAX_DAYS: int = int(os.getenv("PREDICTION_MAX_DAYS", 14))
+# Predictions are keyed by the coef version; the expiry only clears the days of replaced versions
+PREDICTION_CACHE_TTL: int = int(os.getenv("PREDICTION_CACHE_TTL", 30 * 86400))
+# Seconds between keep-alive comments on idle readings streams
+STREAM_HEARTBEAT: int = int(os.getenv("STREAM_HEARTBEAT", 20))
+# Part of the (non-expiring) yearly tide table keys: bump it when yearly_tide_table changes
+YEARLY_TABLE_REVISION: int = 2
+# Longest window served from the full-rate readings tier (0 serves only the hourly readings)
+HIGHRES_MAX_DAYS: int = int(os.getenv("HIGHRES_MAX_DAYS", 7))
+
+logger = logging.getLogger(__name__)
+
+# Full-rate readings of one station by UTC day (see app/internal/highres.py and db_scripts/readings_highres.py)
+HIGHRES_QUERY: str = """
+    SELECT h.day, h.count, h.quantum, h.times, h.values, s.station_id, s.label AS station_label
+    FROM readings_highres h
+    JOIN stations s ON s.station_id = h.station_id
+    WHERE s.label = :station_label
+        AND h.day BETWEEN :first_day AND :last_day
+    ORDER BY h.day;
+"""
+
+# Hourly coverage bitmaps of one station (maintained by the ingest scripts, see db_scripts/readings_coverage.py)
+COVERAGE_QUERY: str = """
+    SELECT c.month, c.bits::text AS bits
+    FROM stations s
+    LEFT JOIN station_coverage c
+        ON c.station_id = s.station_id AND c.month BETWEEN :first_month AND :last_month
+    WHERE s.label = :station_label
+    ORDER BY c.month;
+"""
+
+def readings_cache_key(station_label: str, start_date: Optional[str], end_date: Optional[str]) -> str:
+    return f"readings:{station_label}:{start_date}:{end_date}"
+
+def highres_window(start: pendulum.DateTime, end: pendulum.DateTime) -> bool:
+    # Windows short enough to be served at the full rate, where the station has it
+    return HIGHRES_MAX_DAYS > 0 and end - start <= pendulum.duration(days=HIGHRES_MAX_DAYS)
+
+def readings_index_key(station_label: str) -> str:
+    # Set of the cached readings ranges of a station, so superset lookups don't need KEYS
+    return f"readings-index:{station_label}"
+
 
 router = APIRouter(
     prefix="/data",
@@ -30,9 +81,52 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-async def fetch_readings_for_station(station_label:str, request: Request, start_date: Optional[str]=None, end_date: Optional[str]=None) -> tuple[List[Reading], pendulum.DateTime, pendulum.DateTime]:
+async def fetch_highres_readings(conn: AsyncConnection, station_label: str, start: pendulum.DateTime, end: pendulum.DateTime, readings: List[Reading]) -> List[Reading]:
+    '''
+    Replace the hourly readings with the full-rate ones where the tier covers them: within the runs
+    of its readings (see highres.runs), so the hours of a partly covered day it lacks are kept
+    '''
+    try:
+        with stage("db"):
+            result: CursorResult = await conn.execute(
+                text(HIGHRES_QUERY),
+                {"station_label": station_label, "first_day": start.date(), "last_day": end.date()},
+            )
+            rows: Sequence[RowMapping] = result.mappings().all()
+    except ProgrammingError:
+        # readings_highres is created by the first ingest with HIGHRES_READINGS
+        return readings
+    if not rows:
+        return readings
+
+    lo = np.datetime64(start.naive().isoformat(), "s")
+    hi = np.datetime64(end.naive().isoformat(), "s")
+    day_times: List[ndarray] = []
+    full_rate: List[Reading] = []
+    for row in rows:
+        seconds, values = highres.decode(row["times"], row["values"], row["count"], row["quantum"])
+        times: ndarray = np.datetime64(row["day"], "s") + seconds
+        keep: ndarray = (times >= lo) & (times <= hi)
+        day_times.append(times)
+        full_rate.extend(
+            Reading(date_time=date_time, value=value, station_id=row["station_id"], station_label=row["station_label"])
+            for date_time, value in zip(times[keep].tolist(), values[keep].tolist())
+        )
+    # The runs can cross midnight, so they are found over all the days at once
+    starts, ends = highres.runs(np.concatenate(day_times))
+    hourly_times: ndarray = np.array([r.date_time.in_timezone("UTC").naive() for r in readings], dtype="datetime64[s]")
+    replaced: ndarray = highres.covered(hourly_times, starts, ends)
+    hourly: List[Reading] = [r for r, done in zip(readings, replaced) if not done]
+    return sorted(hourly + full_rate, key=lambda r: r.date_time)
+
+
+async def fetch_readings_for_station(station_label:str, request: Request, start_date: Optional[str]=None, end_date: Optional[str]=None, highres: bool=False) -> tuple[List[Reading], pendulum.DateTime, pendulum.DateTime]:
+    '''
+    Readings of the station in the window (the last two weeks by default, at most six months).
+    With highres, short windows (see highres_window) get the full-rate readings where the tier has them.
+    '''
     
-    print(f"[DEBUG] /data/{station_label}: Making a new request for {start_date} to {end_date}")
+    logger.debug("/data/%s: Making a new request for %s to %s", station_label, start_date, end_date)
     
     today: pendulum.DateTime = pendulum.now().in_timezone("UTC")
     start: pendulum.DateTime = cast(pendulum.DateTime, pendulum.parse(start_date)).in_timezone("UTC") if start_date else today.subtract(weeks=2)
@@ -55,30 +149,19 @@ async def fetch_readings_for_station(station_label:str, request: Request, start_
         if engine is None:
             raise HTTPException(status_code=503, detail="Database engine unavailable")
         
-        query: str = """
-            SELECT 
-                r.date_time AT TIME ZONE 'UTC' AS date_time, 
-                r.value, 
-                r.station_id, 
-                s.label AS station_label
-            FROM readings r
-            JOIN stations s ON r.station_id = s.station_id
-            WHERE s.label = :station_label
-                AND r.date_time BETWEEN :start_date AND :end_date
-            ORDER BY r.date_time ASC;
-        """       
         async with engine.connect() as conn:
             conn: AsyncConnection
             
-            result: CursorResult = await conn.execute(
-                text(query),
-                {
-                    "station_label": station_label,
-                    "start_date": start.to_iso8601_string(),
-                    "end_date": end.to_iso8601_string(),
-                },
-            )
-            rows: Sequence[RowMapping] = result.mappings().all()
+            with stage("db"):
+                result: CursorResult = await conn.execute(
+                    text(READINGS_QUERY),
+                    {
+                        "station_label": station_label,
+                        "start_date": start.to_iso8601_string(),
+                        "end_date": end.to_iso8601_string(),
+                    },
+                )
+                rows: Sequence[RowMapping] = result.mappings().all()
                 
             readings: List[Reading] = [
                 Reading(
@@ -89,22 +172,26 @@ async def fetch_readings_for_station(station_label:str, request: Request, start_
                 )
                 for row in rows
             ]
+
+            if highres and highres_window(start, end):
+                readings = await fetch_highres_readings(conn, station_label, start, end, readings)
         return readings, start, end
             
     except Exception as e:
-        print(f"Error fetching stations: {e}")
+        logger.error("Error fetching readings: %s", e)
         raise HTTPException(status_code=500, detail="Internal Server Error during data retrieval.")
 
 async def load_ttable(station_label:str) -> Dict[str, float]:
-    label: str = station_label.replace(" ", "-")
-    tables = list(Path("./app/tide-data/tide-tables/").rglob(f"ttable_*_{label}*"))
-    if len(tables) > 1:
-        return {'MHWS': 0, 'MHWN': 0, 'MLWS': 0, 'MLWN': 0, 'srange': 0, 'nrange': 0}
-    
-    async with aiofiles.open(tables[0], 'r') as f:
-        contents = await f.read()
-        
-    return json.loads(contents)
+    ttable: Dict[str, float] | None = tide_data.get_table(station_label)
+    if ttable is None:
+        raise FileNotFoundError(f"No tide table for {station_label}")
+    return ttable
+
+async def load_coef(station_label: str) -> Any | None:
+    '''
+    Loads the utide coefficients of the station, or None if there isn't exactly one coef file for it.
+    '''
+    return tide_data.get_coef(station_label)
 
 async def create_astronomical_tide(station_label: str, datetimes: List[pendulum.DateTime]) -> List[float] | None:
     '''
@@ -117,27 +204,60 @@ async def create_astronomical_tide(station_label: str, datetimes: List[pendulum.
     '''
     if not datetimes:
         return None
-        
-    label: str = station_label.replace(" ", "-")
-    coefs: List[Path] = list(Path("./app/tide-data/coef/").rglob(f"coef_*_{label}*"))
-    
-    if len(coefs) != 1:
-        return None
     
     try:
-        async with aiofiles.open(coefs[0], 'r') as f:
-            contents: str = await f.read()
-        
-        coef: Any = json_to_utide_coef(json.loads(contents))
-        # Convert pendulum DateTimes to pandas DatetimeIndex (timezone-naive UTC)
-        t: pd.DatetimeIndex = pd.DatetimeIndex([dt.naive() for dt in datetimes])
-        h: ndarray = utide.reconstruct(t, coef, verbose=False).h
+        terms: dict | None = tide_data.get_terms(station_label)
+        if terms is None:
+            return None
+        # Convert pendulum DateTimes to timezone-naive UTC datetime64
+        t: ndarray = np.array([dt.naive() for dt in datetimes], dtype="datetime64[ns]")
+        with stage("reconstruct"):
+            h: ndarray = predict(terms, t)
         
         return h.tolist()
     except Exception as e:
-        print(f"[ERROR] Astronomical tide generation failed: {e}")
+        logger.error("Astronomical tide generation failed: %s", e)
+        return None
+
+async def compute_daily_extremes(station_label: str, first_day: pendulum.Date, last_day: pendulum.Date) -> Dict[str, List[Dict[str, Any]]] | None:
+    '''
+    Predicts the high and low waters of the station for every UTC day between first_day and last_day (inclusive).
+    Returns a dict keyed by the ISO date, with an entry (possibly empty) for every day of the span
+    '''
+    terms: dict | None = tide_data.get_terms(station_label)
+    if terms is None:
+        return None
+
+    # Pad the span so turning points close to midnight are still bracketed
+    span_start: pendulum.DateTime = pendulum.datetime(first_day.year, first_day.month, first_day.day).subtract(hours=1)
+    span_end: pendulum.DateTime = pendulum.datetime(last_day.year, last_day.month, last_day.day).add(days=1, hours=1)
+    times, heights, kind = find_extremes(terms, span_start.naive(), span_end.naive())
+
+    days: Dict[str, List[Dict[str, Any]]] = {
+        first_day.add(days=i).to_date_string(): [] for i in range((last_day - first_day).days + 1)
+    }
+    for dt_str, height, k in zip(datetime_as_string(times, unit="s"), heights.tolist(), kind.tolist()):
+        day: List[Dict[str, Any]] | None = days.get(dt_str[:10])
+        if day is not None:
+            day.append({"date_time": f"{dt_str}Z", "height": round(height, 3), "kind": "H" if k > 0 else "L"})
+    return days
+
+
+def predict_days(station_label: str, days: List[pendulum.Date], step_minutes: int) -> Dict[str, List[float]] | None:
+    '''
+    Predicts the astronomical tide of whole UTC days, every step_minutes from midnight.
+    Returns the heights keyed by the ISO date, or None if the station has no coefficients
+    '''
+    terms: dict | None = tide_data.get_terms(station_label)
+    if terms is None:
         return None
 
+    per_day: int = 1440 // step_minutes
+    midnights: ndarray = np.array([d.to_date_string() for d in days], dtype="datetime64[ns]")
+    t: ndarray = (midnights[:, None] + np.arange(per_day) * np.timedelta64(step_minutes, "m")).ravel()
+    heights: ndarray = predict(terms, t).reshape(len(days), per_day).round(3)
+    return {d.to_date_string(): row.tolist() for d, row in zip(days, heights)}
+
 
 @router.get("/{station_label}", response_model=StationDataResponse)
 async def get_readings_data(
@@ -145,15 +265,12 @@ async def get_readings_data(
     request: Request,
     start_date: Optional[str]=None,
     end_date: Optional[str]=None,
-    redis=Depends(get_redis)
+    cache: ResilientCache=Depends(get_cache)
 ) -> Union[StationDataResponse, Dict[str, Any]]:
     """
     Endpoint that retrieves water level measurements from the db, generates the astronomical tide prediction and also return the tide tables.
     """
-    print("----------------------------")
-    print(station_label)
-    print(start_date, " ", end_date)
-    print("----------------------------")
+    logger.debug("/data/%s: %s to %s", station_label, start_date, end_date)
        
     # --- Redis Caching ---
     # Parse requested range
@@ -167,12 +284,19 @@ async def get_readings_data(
         if requested_start >= requested_end:
             raise HTTPException(status_code=404, detail=f"End date must be greater than the Start date.")
     
-    cache_key: str = f"readings:{station_label}:{start_date}:{end_date}"
-    cached_data: Optional[bytes] = await redis.get(cache_key)
+    cache_key: str = readings_cache_key(station_label, start_date, end_date)
+    # The exact key with its remaining TTL and the other cached ranges of the station, in one round
+    # trip (an unavailable cache reads as a miss, served from the database)
+    cached_data, ttl, keys = await cache.read(("get", cache_key), ("ttl", cache_key), ("smembers", readings_index_key(station_label)))
     
-    # If we have the exact key then brilliant => return it
+    # If we have the exact key then brilliant => return it (refreshing it in the background when stale)
     if cached_data:
-        print("[DEBUG] Served from REDIS")
+        logger.debug("Served from REDIS")
+        if swr.is_stale(ttl):
+            CACHE_OUTCOMES.inc(outcome="stale")
+            swr.revalidate(cache, cache_key, "readings", lambda: load_readings_data(station_label, request, cache, start_date, end_date))
+        else:
+            CACHE_OUTCOMES.inc(outcome="exact")
         cached_json = json.loads(cached_data)
         # Ensure actual_start_date and actual_end_date are present
         if "actual_start_date" not in cached_json or "actual_end_date" not in cached_json:
@@ -185,12 +309,10 @@ async def get_readings_data(
 
     # If we don't have the key check if it belongs to a superset
     superset_key: Optional[str] = None
-    # Retrieve all redis keys for the station
-    keys: List[str] = await redis.keys(f"readings:{station_label}:*")
     # Example: readings:Lowestoft:2025-04-30T23:04:00.000Z:2025-05-03T23:04:00.000Z
     cache_key_regex: re.Pattern[str] = re.compile(rf"^readings:{re.escape(station_label)}:(.+?[A-Z]):(.+[A-Z])$")
     
-    for key in keys:
+    for key in keys or ():
         match: Optional[re.Match[str]]= cache_key_regex.match(key)
         
         if match:
@@ -200,20 +322,22 @@ async def get_readings_data(
                 cached_end: pendulum.DateTime = cast(pendulum.DateTime, pendulum.parse(cached_end_str))
                 
             except Exception as e:
-                print(f"[ERROR] Key: {key}")
-                print(f"[ERROR] Extracted: start={cached_start_str}, end={cached_end_str}")
-                print(f"[ERROR] Failed to parse dates for key {key}: {e}")
+                logger.error("Failed to parse dates for key %s (start=%s, end=%s): %s", key, cached_start_str, cached_end_str, e)
                 continue
-            # Check if cached range fully covers requested range
+            # Check if cached range fully covers requested range (at the same resolution: a long
+            # hourly window doesn't stand in for a short one served at the full rate)
             if requested_start and requested_end:
+                if highres_window(requested_start, requested_end) and not highres_window(cached_start, cached_end):
+                    continue
                 if cached_start <= requested_start and cached_end >= requested_end: # type: ignore
                     superset_key = key
                     break
                 
-    # If superset found, load and filter them
-    if superset_key:
-        print(f"Superset cache found: {superset_key}")
-        superset_data = await redis.get(superset_key)
+    # If superset found, load and filter them (it may have expired since it was indexed)
+    superset_data: Optional[str] = await cache.get(superset_key) if superset_key else None
+    if superset_data:
+        logger.debug("Superset cache found: %s", superset_key)
+        CACHE_OUTCOMES.inc(outcome="superset")
         superset_json: Dict[str, Any] = json.loads(superset_data)
 
         # Filter date_time and values arrays to requested range
@@ -251,24 +375,35 @@ async def get_readings_data(
             "unit": superset_json.get("unit", "mAOD")
         }
 
-        print("[DEBUG] Served filtered superset from REDIS")
-        return StationDataResponse(**filtered_response)
+        logger.debug("Served filtered superset from REDIS")
+        with stage("serialize"):
+            return StationDataResponse(**filtered_response)
 
-    
-    try:
-        readings, actual_start, actual_end = await fetch_readings_for_station(station_label, request, start_date=start_date, end_date=end_date)
+    CACHE_OUTCOMES.inc(outcome="miss")
+    return await load_readings_data(station_label, request, cache, start_date, end_date)
 
-        if not readings:
-            raise HTTPException(status_code=404, detail=f"Station '{station_label}' not found or has no data.")
 
-        # Generate astronomical tide for the exact timestamps of the readings
-        reading_datetimes: List[pendulum.DateTime] = [r.date_time for r in readings]
-        astronomical: List[float] | None = await create_astronomical_tide(station_label, reading_datetimes)
-    except ConnectionError as e:
-        raise HTTPException(status_code=503, detail=str(e))
-    except Exception as e:
-        print(f"Error fetching data for {station_label}: {e}")
-        raise HTTPException(status_code=500, detail="Internal Server Error during data retrieval.")
+async def load_readings_data(station_label: str, request: Request, cache: ResilientCache, start_date: Optional[str], end_date: Optional[str]) -> StationDataResponse:
+    '''
+    Query the readings of a window, add the astronomical tide and surge, and cache the response
+    (the miss path of get_readings_data, also run in the background to refresh stale entries)
+    '''
+    cache_key: str = readings_cache_key(station_label, start_date, end_date)
+    async with miss_limiter.slot():
+        try:
+            readings, actual_start, actual_end = await fetch_readings_for_station(station_label, request, start_date=start_date, end_date=end_date, highres=True)
+
+            if not readings:
+                raise HTTPException(status_code=404, detail=f"Station '{station_label}' not found or has no data.")
+
+            # Generate astronomical tide for the exact timestamps of the readings
+            reading_datetimes: List[pendulum.DateTime] = [r.date_time for r in readings]
+            astronomical: List[float] | None = await create_astronomical_tide(station_label, reading_datetimes)
+        except ConnectionError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception as e:
+            logger.error("Error fetching data for %s: %s", station_label, e)
+            raise HTTPException(status_code=500, detail="Internal Server Error during data retrieval.")
 
     # Data Transformation
     # The datetime objects from the DB are converted to ISO strings by Pydantic's serialization
@@ -288,33 +423,71 @@ async def get_readings_data(
 
     # Pydantic serialization and validation
     try:
-        response = StationDataResponse(
-            station_id=station_id[0],
-            station_label=station_label,
-            date_time=date_times,
-            values=values,
-            astro=astronomical,
-            surge=surge,
-            actual_start_date=actual_start_str,
-            actual_end_date=actual_end_str,
-            unit="mAOD"
-        )
+        with stage("serialize"):
+            response = StationDataResponse(
+                station_id=station_id[0],
+                station_label=station_label,
+                date_time=date_times,
+                values=values,
+                astro=astronomical,
+                surge=surge,
+                actual_start_date=actual_start_str,
+                actual_end_date=actual_end_str,
+                unit="mAOD"
+            )
+            response_json: str = response.model_dump_json()
     except ValidationError as err:
         raise HTTPException(status_code=500, detail=f"Validation error. {repr(err.errors()[0]['type'])} {repr(err.errors()[0]['loc'])}")
 
-    # Cache the response in Redis (as JSON)    
-    await redis.set(cache_key, response.model_dump_json(), ex=CACHE_TIME_LIMIT)  # Cache for 1 hour
+    # Cache the response in Redis (as JSON), fresh for 1 hour, and index it for the superset lookups
+    cache.write(
+        ("set", cache_key, response_json, swr.hard_ttl(CACHE_TIME_LIMIT)),
+        ("sadd", readings_index_key(station_label), cache_key),
+        ("expire", readings_index_key(station_label), swr.hard_ttl(CACHE_TIME_LIMIT)),
+    )
 
     return response
 
 
 @router.get("/{station_label}/table", response_model=StationTableResponse)
-async def get_tide_tables(station_label: str, redis=Depends(get_redis)):
+async def get_tide_tables(
+    station_label: str,
+    year: Optional[int] = Query(None, ge=1900, le=2100, description="Compute the levels of this year instead of the long-term table"),
+    cache: ResilientCache=Depends(get_cache)
+):
+    """
+    Endpoint that returns the tide levels (MHWS, MHWN, MLWS, MLWN and ranges) of the station: the static
+    long-term table, or with `year` the levels of that year, which follow the 18.6-year nodal cycle.
+    Yearly tables are computed on first request and cached per coefficient version; when they can't be
+    computed the static table is returned (without a year).
+    """
+    if year is not None:
+        version: str | None = tide_data.get_version(station_label)
+        if version is not None:
+            year_key: str = f"ttable:{station_label}:{version}:{year}:r{YEARLY_TABLE_REVISION}"
+            cached_year: Optional[str] = await cache.get(year_key)
+            if cached_year:
+                logger.debug("Tide table of %s for %d served from REDIS", station_label, year)
+                return json.loads(cached_year)
+
+            try:
+                async with miss_limiter.slot():
+                    with stage("reconstruct"):
+                        tidal_info: Dict[str, float] = yearly_tide_table(tide_data.get_terms(station_label), year)
+                response = StationTableResponse(station_label=station_label, tidal_info=tidal_info, year=year)
+                # A year only changes with the coefficients (the version in the key), so it is stored without an expiry
+                cache.set(year_key, response.model_dump_json())
+                return response
+            except HTTPException:
+                raise
+            except Exception as e:
+                logger.warning("Tide table of %s for %d failed, serving the static one: %s", station_label, year, e)
+
     cache_key: str = f"ttable:{station_label}"
-    cached_data: Optional[bytes] = await redis.get(cache_key)
+    cached_data: Optional[str] = await cache.get(cache_key)
     
     if cached_data:
-        print(f"[DEBUG] Tide table for {station_label} served from REDIS")
+        logger.debug("Tide table for %s served from REDIS", station_label)
         return json.loads(cached_data)
     
     try:
@@ -327,6 +500,274 @@ async def get_tide_tables(station_label: str, redis=Depends(get_redis)):
         raise HTTPException(status_code=500, detail="Internal Server Error during data retrieval.")
     
     # Cache the response in Redis (tide tables don't change, so longer cache)
-    await redis.set(cache_key, response.model_dump_json(), ex=CACHE_TIME_LIMIT * 24)  # Cache for 24 hours
+    cache.set(cache_key, response.model_dump_json(), ex=CACHE_TIME_LIMIT * 24)  # Cache for 24 hours
     
-    return response
\ No newline at end of file
+    return response
+
+
+@router.get("/{station_label}/extremes", response_model=StationExtremesResponse)
+async def get_extremes(
+    station_label: str,
+    start: Optional[str]=None,
+    end: Optional[str]=None,
+    cache: ResilientCache=Depends(get_cache)
+) -> StationExtremesResponse:
+    """
+    Endpoint that returns the predicted high and low water times and heights.
+    Each UTC day is computed once and cached without expiry, as its prediction never changes.
+    """
+    start_dt: pendulum.DateTime = cast(pendulum.DateTime, pendulum.parse(start)).in_timezone("UTC") if start else pendulum.now("UTC")
+    end_dt: pendulum.DateTime = cast(pendulum.DateTime, pendulum.parse(end)).in_timezone("UTC") if end else start_dt.add(days=2)
+
+    if start_dt >= end_dt:
+        raise HTTPException(status_code=404, detail=f"End date must be greater than the Start date.")
+
+    # Cap the span so a single request can't trigger an unbounded computation
+    if end_dt > start_dt.add(days=EXTREMES_MAX_DAYS):
+        end_dt = start_dt.add(days=EXTREMES_MAX_DAYS)
+
+    first_day: pendulum.Date = start_dt.date()
+    dates: List[pendulum.Date] = [first_day.add(days=i) for i in range((end_dt.date() - first_day).days + 1)]
+    days: List[str] = [d.to_date_string() for d in dates]
+    version: str | None = tide_data.get_version(station_label)
+    if version is None:
+        raise HTTPException(status_code=404, detail=f"Station '{station_label}' not found or has no coefficients.")
+    keys: List[str] = [f"extremes:{station_label}:{version}:{day}" for day in days]
+
+    cached: List[Optional[str]] = await cache.mget(keys)
+    by_day: Dict[str, List[Dict[str, Any]]] = {day: json.loads(c) for day, c in zip(days, cached) if c is not None}
+    missing: List[pendulum.Date] = [d for d, day in zip(dates, days) if day not in by_day]
+
+    if missing:
+        async with miss_limiter.slot():
+            try:
+                with stage("reconstruct"):
+                    computed = await compute_daily_extremes(station_label, missing[0], missing[-1])
+            except Exception as e:
+                logger.error("Extremes prediction failed for %s: %s", station_label, e)
+                raise HTTPException(status_code=500, detail="Internal Server Error during tide prediction.")
+
+        if computed is None:
+            raise HTTPException(status_code=404, detail=f"Station '{station_label}' not found or has no coefficients.")
+
+        # Days only change when the coefficients do (the version in the key), so each one is stored without an expiry
+        cache.mset({f"extremes:{station_label}:{version}:{day}": json.dumps(entries) for day, entries in computed.items()})
+        by_day.update(computed)
+
+    start_str: str = start_dt.format("YYYY-MM-DDTHH:mm:ss") + "Z"
+    end_str: str = end_dt.format("YYYY-MM-DDTHH:mm:ss") + "Z"
+    events: List[Dict[str, Any]] = [
+        event for day in days for event in by_day[day] if start_str <= event["date_time"] <= end_str
+    ]
+
+    return StationExtremesResponse(
+        station_label=station_label,
+        date_time=[e["date_time"] for e in events],
+        height=[e["height"] for e in events],
+        kind=[e["kind"] for e in events],
+        unit="mAOD"
+    )
+
+
+@router.get("/{station_label}/prediction", response_model=StationPredictionResponse)
+async def get_prediction(
+    station_label: str,
+    days: int = Query(2, ge=1, le=PREDICTION_MAX_DAYS),
+    step: int = Query(15, ge=1, le=60, description="Minutes between predictions (must divide a day)"),
+    cache: ResilientCache=Depends(get_cache)
+) -> StationPredictionResponse:
+    """
+    Endpoint that returns the astronomical tide from now until `days` ahead, every `step` minutes.
+    Whole UTC days are cached per coefficient version, so they are only recomputed after a refit.
+    """
+    if 1440 % step != 0:
+        raise HTTPException(status_code=400, detail="step must divide a day (e.g. 1, 5, 10, 15, 30 or 60 minutes).")
+
+    version: str | None = tide_data.get_version(station_label)
+    if version is None:
+        raise HTTPException(status_code=404, detail=f"Station '{station_label}' not found or has no coefficients.")
+
+    # From the last step at or before now, to `days` later
+    now: pendulum.DateTime = pendulum.now("UTC")
+    start_dt: pendulum.DateTime = now.start_of("day").add(minutes=(now.hour * 60 + now.minute) // step * step)
+    end_dt: pendulum.DateTime = start_dt.add(days=days)
+
+    first_day: pendulum.Date = start_dt.date()
+    dates: List[pendulum.Date] = [first_day.add(days=i) for i in range((end_dt.date() - first_day).days + 1)]
+    day_strs: List[str] = [d.to_date_string() for d in dates]
+    keys: List[str] = [f"prediction:{station_label}:{version}:{step}:{day}" for day in day_strs]
+
+    cached: List[Optional[str]] = await cache.mget(keys)
+    by_day: Dict[str, List[float]] = {day: json.loads(c) for day, c in zip(day_strs, cached) if c is not None}
+    missing: List[pendulum.Date] = [d for d, day in zip(dates, day_strs) if day not in by_day]
+
+    if missing:
+        async with miss_limiter.slot():
+            try:
+                with stage("reconstruct"):
+                    computed = predict_days(station_label, missing, step)
+            except Exception as e:
+                logger.error("Prediction failed for %s: %s", station_label, e)
+                raise HTTPException(status_code=500, detail="Internal Server Error during tide prediction.")
+
+        if computed is None:
+            raise HTTPException(status_code=404, detail=f"Station '{station_label}' not found or has no coefficients.")
+
+        cache.write(*(
+            ("set", f"prediction:{station_label}:{version}:{step}:{day}", json.dumps(heights), PREDICTION_CACHE_TTL)
+            for day, heights in computed.items()
+        ))
+        by_day.update(computed)
+
+    # Cut the days down to [start_dt, end_dt]
+    per_day: int = 1440 // step
+    first: int = (start_dt.hour * 60 + start_dt.minute) // step
+    count: int = days * per_day + 1
+    heights: List[float] = [h for day in day_strs for h in by_day[day]][first:first + count]
+    times: ndarray = np.datetime64(start_dt.naive().isoformat(), "s") + np.arange(len(heights)) * np.timedelta64(step, "m")
+
+    with stage("serialize"):
+        return StationPredictionResponse(
+            station_label=station_label,
+            date_time=[f"{dt}Z" for dt in datetime_as_string(times, unit="s")],
+            astro=heights,
+            step_minutes=step,
+            coef_version=version,
+            unit="mAOD"
+        )
+
+
+@router.get("/{station_label}/coverage", response_model=StationCoverageResponse)
+async def get_coverage(
+    station_label: str,
+    request: Request,
+    start: Optional[str]=None,
+    end: Optional[str]=None,
+) -> StationCoverageResponse:
+    """
+    Endpoint that returns which hours of [start, end) have readings (defaults to the last 30 days) and the gaps between them.
+    Answered from the coverage bitmap, one small row per month, instead of the readings.
+    """
+    now: pendulum.DateTime = pendulum.now("UTC").start_of("hour")
+    end_dt: pendulum.DateTime = cast(pendulum.DateTime, pendulum.parse(end)).in_timezone("UTC").start_of("hour") if end else now
+    end_dt = min(end_dt, now)
+    start_dt: pendulum.DateTime = cast(pendulum.DateTime, pendulum.parse(start)).in_timezone("UTC").start_of("hour") if start else end_dt.subtract(days=30)
+
+    if start_dt >= end_dt:
+        raise HTTPException(status_code=404, detail=f"End date must be greater than the Start date.")
+    if start_dt < end_dt.subtract(days=COVERAGE_MAX_DAYS):
+        start_dt = end_dt.subtract(days=COVERAGE_MAX_DAYS)
+
+    start_h: np.datetime64 = np.datetime64(start_dt.naive(), "h")
+    end_h: np.datetime64 = np.datetime64(end_dt.naive(), "h")
+    months = coverage.month_starts(start_h, end_h)
+
+    try:
+        engine: Optional[AsyncEngine] = getattr(request.app.state, "db_engine", None)
+        if engine is None:
+            raise HTTPException(status_code=503, detail="Database engine unavailable")
+
+        async with miss_limiter.slot(), engine.connect() as conn:
+            with stage("db"):
+                result: CursorResult = await conn.execute(
+                    text(COVERAGE_QUERY),
+                    {"station_label": station_label, "first_month": months[0], "last_month": months[-1]},
+                )
+                rows: Sequence[RowMapping] = result.mappings().all()
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error fetching coverage of %s: %s", station_label, e)
+        raise HTTPException(status_code=500, detail="Internal Server Error during data retrieval.")
+
+    if not rows:
+        raise HTTPException(status_code=404, detail=f"Station '{station_label}' not found.")
+
+    hours, covered = coverage.coverage_mask([(row["month"], row["bits"]) for row in rows if row["month"] is not None], start_h, end_h)
+    hours_covered: int = int(covered.sum())
+    return StationCoverageResponse(
+        station_label=station_label,
+        start=start_dt.to_iso8601_string(),
+        end=end_dt.to_iso8601_string(),
+        hours_expected=int(hours.size),
+        hours_covered=hours_covered,
+        coverage=round(hours_covered / hours.size, 4),
+        gaps=[[f"{gap_start}:00:00Z", f"{gap_end}:00:00Z"] for gap_start, gap_end in coverage.gaps(hours, covered)],
+    )
+
+
+def parse_event_id(event_id: Optional[str]) -> Optional[pendulum.DateTime]:
+    '''
+    The time of an event id (the time of its last reading), None when missing or not a date time
+    (a client can send anything as Last-Event-ID; the stream then starts without the backfill)
+    '''
+    if not event_id:
+        return None
+    try:
+        parsed = pendulum.parse(event_id)
+    except (ValueError, TypeError, OverflowError):
+        return None
+    if not isinstance(parsed, pendulum.DateTime):
+        return None
+    return parsed.in_timezone("UTC")
+
+
+@router.get("/{station_label}/stream")
+async def stream_readings(station_label: str, request: Request, redis=Depends(get_redis)) -> StreamingResponse:
+    """
+    Server-Sent Events stream of the new readings of a station, pushed as ingestion commits them.
+    Each `readings` event carries date_time, values, astro and surge arrays like the data endpoint,
+    with the time of its last reading as the event id. A client reconnecting with Last-Event-ID
+    first receives the readings it missed, from the database.
+    """
+    since: Optional[pendulum.DateTime] = parse_event_id(request.headers.get("last-event-id"))
+    # Subscribe before the backfill so that nothing committed in between is missed
+    queue: asyncio.Queue = live.broadcaster.subscribe(redis, station_label)
+
+    def format_event(event: Dict[str, Any]) -> str:
+        return f"id: {event['date_time'][-1]}\nevent: readings\ndata: {json.dumps(event)}\n\n"
+
+    async def events():
+        last_sent: Optional[pendulum.DateTime] = since
+        try:
+            yield f"retry: {STREAM_HEARTBEAT * 1000}\n\n"
+
+            if since is not None:
+                try:
+                    async with miss_limiter.slot():
+                        readings, _, _ = await fetch_readings_for_station(station_label, request, start_date=since.to_iso8601_string(), end_date=None)
+                    missed: List[Reading] = [r for r in readings if r.date_time > since]
+                    if missed:
+                        event = live.readings_event(station_label, [r.date_time.to_iso8601_string() for r in missed], [r.value for r in missed])
+                        last_sent = missed[-1].date_time
+                        yield format_event(event)
+                except HTTPException as e:
+                    logger.warning("Readings stream backfill of %s failed: %s", station_label, e.detail)
+
+            while not await request.is_disconnected():
+                try:
+                    event: Optional[Dict[str, Any]] = await asyncio.wait_for(queue.get(), timeout=STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    break
+
+                # Drop points already sent by the backfill
+                times: List[Optional[pendulum.DateTime]] = [parse_event_id(dt) for dt in event["date_time"]]
+                keep: List[int] = [i for i, dt in enumerate(times) if dt is not None and (last_sent is None or dt > last_sent)]
+                if not keep:
+                    continue
+                if len(keep) < len(event["date_time"]):
+                    event = {k: [v[i] for i in keep] if isinstance(v, list) else v for k, v in event.items()}
+                last_sent = times[keep[-1]]
+                yield format_event(event)
+        finally:
+            live.broadcaster.unsubscribe(station_label, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # X-Accel-Buffering stops nginx from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
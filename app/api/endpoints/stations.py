@@ -1,19 +1,27 @@
 import os
 import json
+import logging
 
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from sqlalchemy.engine.row import RowMapping
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncConnection
 from sqlalchemy import text, CursorResult, MappingResult
 
-from fastapi import HTTPException, APIRouter, Request, Depends
+from fastapi import HTTPException, APIRouter, Request, Depends, Query
 from dotenv import load_dotenv
-from app.dependencies.redis import get_redis
-from app.models import Station
+from app.dependencies.redis import ResilientCache, get_cache
+from app.internal import swr
+from app.internal.admission import miss_limiter
+from app.internal.metrics import stage
+from app.internal.queries import LATEST_READINGS_OF_QUERY, LATEST_READINGS_QUERY
+from app.internal.spatial import station_index
+from app.models import Station, NearbyStation
 
 load_dotenv()
 CACHE_TIME_LIMIT = int(os.getenv("CACHE_TIME_LIMIT", 3600))
+STATIONS_CACHE_KEY = "stations:all"
 
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/stations",
@@ -23,21 +31,30 @@ router = APIRouter(
 
 
 @router.get("/")
-async def get_stations(request: Request, redis=Depends(get_redis)) -> Dict[str, Any]:
+async def get_stations(request: Request, cache: ResilientCache=Depends(get_cache)) -> Dict[str, Any]:
     """
     Function to list all stations along with their metadata and latest readings
     """
     # --- Redis Caching ---
-    # Search for a cached data in redis
-    cache_key = "stations:all"
-    cached: Optional[bytes] = await redis.get(cache_key)
+    # Search for a cached data in redis, with its remaining TTL
+    cached, ttl = await cache.read(("get", STATIONS_CACHE_KEY), ("ttl", STATIONS_CACHE_KEY))
     if cached:
-        # Return cached station dict
-        print(" ===> Loaded the stations from REDIS")
+        # Return cached station dict (refreshing it in the background when stale)
+        logger.debug("Loaded the stations from REDIS")
+        if swr.is_stale(ttl):
+            swr.revalidate(cache, STATIONS_CACHE_KEY, "stations", lambda: load_stations(request, cache))
         cached_obj = json.loads(cached)
         # Ensure alphabetical order by label even when served from cache
         return dict(sorted(cached_obj.items(), key=lambda item: item[0].lower()))
 
+    return await load_stations(request, cache)
+
+
+async def load_stations(request: Request, cache: ResilientCache) -> Dict[str, Any]:
+    '''
+    Query the stations with their latest readings and cache them (the miss path of get_stations,
+    also run in the background to refresh a stale list)
+    '''
     try:
         # Retrieve the db_engine stored in the state of the app associated with this request
         engine: Optional[AsyncEngine] = getattr(request.app.state, "db_engine", None)
@@ -45,29 +62,14 @@ async def get_stations(request: Request, redis=Depends(get_redis)) -> Dict[str,
         if engine is None:
             raise HTTPException(status_code=503, detail="Database engine unavailable")
         
-        query: str = """
-            SELECT DISTINCT ON (s.station_id)
-                s.label,
-                s.station_id,
-                r.date_time AS latest_reading,
-                r.value,
-                s.lat,
-                s.long
-            FROM stations s
-            JOIN readings r ON s.station_id = r.station_id
-            ORDER BY
-                s.station_id,
-                r.date_time DESC,
-                s.label ASC;
-        """
-        
-        async with engine.connect() as conn:
+        async with miss_limiter.slot(), engine.connect() as conn:
             conn:AsyncConnection
             
             station_list = []
             stations:Dict[str, Any] = {}
-            result: CursorResult = await conn.execute(text(query))
-            rows: MappingResult = result.mappings()
+            with stage("db"):
+                result: CursorResult = await conn.execute(text(LATEST_READINGS_QUERY))
+                rows: MappingResult = result.mappings()
             
             
             
@@ -88,12 +90,118 @@ async def get_stations(request: Request, redis=Depends(get_redis)) -> Dict[str,
             station_list.sort(key=lambda item: item[0].lower())
             stations = {label: data for label, data in station_list}
                 
-        # Cache the stations dict as JSON
-        await redis.set(cache_key, json.dumps(stations), ex=CACHE_TIME_LIMIT)    
+        # Cache the stations dict as JSON (fresh for CACHE_TIME_LIMIT, then served stale while refreshed)
+        cache.set(STATIONS_CACHE_KEY, json.dumps(stations), ex=swr.hard_ttl(CACHE_TIME_LIMIT))
         return stations
     
+    except HTTPException:
+        raise
+    except ConnectionError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error("Error fetching stations: %s", e)
+        raise HTTPException(status_code=500, detail="Internal Server Error during data retrieval.")
+
+
+async def latest_station_readings(request: Request, cache: ResilientCache, station_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    '''
+    Station dicts (as in get_stations) of the given stations, keyed by station_id. Taken from the
+    cached station list when there is one, otherwise queried for just these stations.
+    Stations without readings are left out.
+    '''
+    if not station_ids:
+        return {}
+
+    cached: Optional[str] = await cache.get(STATIONS_CACHE_KEY)
+    if cached:
+        wanted = set(station_ids)
+        return {station["station_id"]: station for station in json.loads(cached).values() if station["station_id"] in wanted}
+
+    engine: Optional[AsyncEngine] = getattr(request.app.state, "db_engine", None)
+    if engine is None:
+        raise HTTPException(status_code=503, detail="Database engine unavailable")
+
+    async with miss_limiter.slot(), engine.connect() as conn:
+        with stage("db"):
+            result: CursorResult = await conn.execute(text(LATEST_READINGS_OF_QUERY), {"station_ids": station_ids})
+            rows: MappingResult = result.mappings()
+        return {
+            row["station_id"]: Station(
+                label=row["label"],
+                station_id=row["station_id"],
+                date_time=row["latest_reading"].isoformat(),
+                latest_reading=row["value"],
+                lat=row["lat"],
+                lon=row["long"]
+            ).model_dump()
+            for row in rows
+        }
+
+
+async def refresh_station_index(request: Request):
+    engine: Optional[AsyncEngine] = getattr(request.app.state, "db_engine", None)
+    if engine is None:
+        raise HTTPException(status_code=503, detail="Database engine unavailable")
+    await station_index.refresh(engine)
+
+
+@router.get("/nearest", response_model=List[NearbyStation])
+async def get_nearest_stations(
+    request: Request,
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    k: int = Query(5, ge=1, le=50),
+    cache: ResilientCache=Depends(get_cache)
+) -> List[Dict[str, Any]]:
+    """
+    The k stations closest to (lat, lon), closest first, with their great-circle distance and latest reading
+    """
+    try:
+        await refresh_station_index(request)
+        # Ask for a few more, in case some of the closest stations have no readings yet
+        nearest = station_index.nearest(lat, lon, k + 5)
+        latest = await latest_station_readings(request, cache, [station_id for station_id, _, _ in nearest])
+        return [
+            {**latest[station_id], "distance_km": round(distance, 3)}
+            for station_id, _, distance in nearest
+            if station_id in latest
+        ][:k]
+
+    except HTTPException:
+        raise
+    except ConnectionError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error("Error fetching the nearest stations: %s", e)
+        raise HTTPException(status_code=500, detail="Internal Server Error during data retrieval.")
+
+
+@router.get("/within")
+async def get_stations_within(
+    request: Request,
+    bbox: str = Query(..., description="min_lon,min_lat,max_lon,max_lat (min_lon > max_lon crosses the antimeridian)"),
+    cache: ResilientCache=Depends(get_cache)
+) -> Dict[str, Any]:
+    """
+    Stations inside the bounding box with their latest readings, keyed and sorted by label like get_stations
+    """
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(part) for part in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be min_lon,min_lat,max_lon,max_lat")
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= 180 and -180 <= max_lon <= 180):
+        raise HTTPException(status_code=400, detail="bbox is outside the valid coordinates or min_lat > max_lat")
+
+    try:
+        await refresh_station_index(request)
+        within = station_index.within(min_lon, min_lat, max_lon, max_lat)
+        latest = await latest_station_readings(request, cache, [station_id for station_id, _ in within])
+        return {label: latest[station_id] for station_id, label in within if station_id in latest}
+
+    except HTTPException:
+        raise
     except ConnectionError as e:
         raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
-        print(f"Error fetching stations: {e}")
-        raise HTTPException(status_code=500, detail="Internal Server Error during data retrieval.")
\ No newline at end of file
+        logger.error("Error fetching the stations within %s: %s", bbox, e)
+        raise HTTPException(status_code=500, detail="Internal Server Error during data retrieval.")
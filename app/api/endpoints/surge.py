@@ -0,0 +1,291 @@
+import os
+import json
+import hashlib
+import logging
+from typing import Any, Dict, List, Literal, Optional, cast
+
+import numpy as np
+import pendulum
+from fastapi import Depends, HTTPException, APIRouter, Request, Query
+from sqlalchemy import text, CursorResult
+from sqlalchemy.exc import ProgrammingError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncConnection
+from dotenv import load_dotenv
+
+from app.dependencies.redis import ResilientCache, get_cache
+from app.internal import extremes, tide_data
+from app.internal.admission import miss_limiter
+from app.internal.correlation import lagged_correlation
+from app.internal.harmonics import predict
+from app.internal.metrics import stage
+from app.internal.queries import READINGS_VERSION_QUERY, RETURN_PERIOD_QUERY, STATIONS_READINGS_QUERY, events_query
+from app.models import SurgeEvent, SurgeCorrelation, SurgeCorrelationResponse, SurgeReturnPeriod
+
+load_dotenv()
+CACHE_TIME_LIMIT: int = int(os.getenv("CACHE_TIME_LIMIT", 3600))
+CORRELATION_MAX_DAYS: int = int(os.getenv("CORRELATION_MAX_DAYS", 92))
+CORRELATION_MAX_STATIONS: int = int(os.getenv("CORRELATION_MAX_STATIONS", 12))
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/surge",
+    tags=["surge"],
+    responses={404: {"description": "Not found"}},
+)
+
+
+@router.get("/events", response_model=List[SurgeEvent])
+async def get_surge_events(
+    request: Request,
+    station_label: Optional[str]=None,
+    start_date: Optional[str]=None,
+    end_date: Optional[str]=None,
+    min_surge: Optional[float]=None,
+    order: Literal["peak", "time"]="peak",
+    limit: int=Query(default=100, ge=1, le=1000),
+) -> List[SurgeEvent]:
+    """
+    Endpoint that lists indexed surge events (threshold exceedances), optionally for one station,
+    overlapping a time window and above a minimum peak surge.
+    Reads only the surge_events table, which db_scripts/surge_events.py appends to after every ingest.
+    """
+    engine: Optional[AsyncEngine] = getattr(request.app.state, "db_engine", None)
+    if engine is None:
+        raise HTTPException(status_code=503, detail="Database engine unavailable")
+
+    conditions: List[str] = []
+    params: Dict[str, Any] = {"limit": limit}
+
+    if station_label:
+        conditions.append("s.label = :station_label")
+        params["station_label"] = station_label
+    if start_date:
+        conditions.append("e.end_time >= :start_date")
+        params["start_date"] = cast(pendulum.DateTime, pendulum.parse(start_date)).in_timezone("UTC").to_iso8601_string()
+    if end_date:
+        conditions.append("e.start_time <= :end_date")
+        params["end_date"] = cast(pendulum.DateTime, pendulum.parse(end_date)).in_timezone("UTC").to_iso8601_string()
+    if min_surge is not None:
+        conditions.append("e.peak_surge >= :min_surge")
+        params["min_surge"] = min_surge
+
+    query: str = events_query(conditions, order)
+
+    try:
+        async with miss_limiter.slot(), engine.connect() as conn:
+            conn: AsyncConnection
+            with stage("db"):
+                result: CursorResult = await conn.execute(text(query), params)
+                rows = result.mappings().all()
+
+        return [
+            SurgeEvent(
+                station_label=row["station_label"],
+                station_id=row["station_id"],
+                start_time=row["start_time"].isoformat(),
+                end_time=row["end_time"].isoformat(),
+                peak_time=row["peak_time"].isoformat(),
+                peak_surge=row["peak_surge"],
+                duration_hours=(row["end_time"] - row["start_time"]).total_seconds() / 3600,
+            )
+            for row in rows
+        ]
+
+    except HTTPException:
+        raise
+    except ConnectionError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error("Error fetching surge events: %s", e)
+        raise HTTPException(status_code=500, detail="Internal Server Error during data retrieval.")
+
+
+def hourly_surge(labels: List[str], rows: List[Any], start: np.datetime64, hours: int) -> np.ndarray:
+    '''
+    Surge (observed - astronomical, as in /data/{station_label}) of every station on an hourly grid
+    from start, NaN where there is no reading
+    '''
+    series = np.full((len(labels), hours), np.nan)
+    by_label: Dict[str, List[Any]] = {}
+    for row in rows:
+        by_label.setdefault(row[0], []).append(row)
+
+    for i, label in enumerate(labels):
+        station_rows = by_label.get(label)
+        if not station_rows:
+            continue
+        times = np.array([row[1] for row in station_rows], dtype="datetime64[ns]")
+        values = np.array([row[2] for row in station_rows], dtype=float)
+        surge = values - predict(tide_data.get_terms(label), times)
+        index = ((times.astype("datetime64[h]") - start) / np.timedelta64(1, "h")).astype(int)
+        inside = (index >= 0) & (index < hours)
+        series[i, index[inside]] = surge[inside]
+    return series
+
+
+def _rounded(value: float) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 4)
+
+
+@router.get("/correlation", response_model=SurgeCorrelationResponse)
+async def get_surge_correlation(
+    request: Request,
+    stations: List[str] = Query(..., description="Station labels (repeat the parameter, 2 or more)"),
+    start_date: Optional[str]=None,
+    end_date: Optional[str]=None,
+    max_lag_hours: int = Query(default=12, ge=0, le=72),
+    cache: ResilientCache=Depends(get_cache),
+) -> SurgeCorrelationResponse:
+    """
+    Endpoint that correlates the hourly surge of every pair of the stations over a window (defaults to the
+    last 7 days), at zero lag and at the lag in [-max_lag_hours, max_lag_hours] that correlates best.
+    Cached per station set, window and version of the data (readings in the window and coefficients).
+    """
+    labels: List[str] = sorted(set(stations))
+    if not 2 <= len(labels) <= CORRELATION_MAX_STATIONS:
+        raise HTTPException(status_code=400, detail=f"Between 2 and {CORRELATION_MAX_STATIONS} different stations are needed.")
+
+    missing_coef: List[str] = [label for label in labels if tide_data.get_terms(label) is None]
+    if missing_coef:
+        raise HTTPException(status_code=404, detail=f"No coefficients for {', '.join(missing_coef)}, so no surge.")
+
+    # Whole hours, so that nearby requests share a cache entry
+    end_dt: pendulum.DateTime = (cast(pendulum.DateTime, pendulum.parse(end_date)).in_timezone("UTC") if end_date else pendulum.now("UTC")).start_of("hour")
+    start_dt: pendulum.DateTime = (cast(pendulum.DateTime, pendulum.parse(start_date)).in_timezone("UTC") if start_date else end_dt.subtract(days=7)).start_of("hour")
+    if start_dt >= end_dt:
+        raise HTTPException(status_code=404, detail=f"End date must be greater than the Start date.")
+    if start_dt < end_dt.subtract(days=CORRELATION_MAX_DAYS):
+        start_dt = end_dt.subtract(days=CORRELATION_MAX_DAYS)
+
+    engine: Optional[AsyncEngine] = getattr(request.app.state, "db_engine", None)
+    if engine is None:
+        raise HTTPException(status_code=503, detail="Database engine unavailable")
+    params: Dict[str, Any] = {"labels": labels, "start_date": start_dt, "end_date": end_dt}
+
+    # The version query and the cache lookup are cheap, so hits don't wait for a slot
+    try:
+        async with engine.connect() as conn:
+            conn: AsyncConnection
+            with stage("db"):
+                versions = (await conn.execute(text(READINGS_VERSION_QUERY), params)).all()
+    except ConnectionError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error("Error fetching the data version for the surge correlation: %s", e)
+        raise HTTPException(status_code=500, detail="Internal Server Error during data retrieval.")
+
+    if len(versions) != len(labels):
+        unknown: List[str] = sorted(set(labels) - {row[0] for row in versions})
+        raise HTTPException(status_code=404, detail=f"Unknown stations: {', '.join(unknown)}")
+
+    fingerprint: str = json.dumps(
+        [[row[0], row[1], row[2].isoformat() if row[2] else None, tide_data.get_version(row[0])] for row in sorted(versions)]
+    )
+    data_version: str = hashlib.sha1(fingerprint.encode()).hexdigest()[:12]
+    cache_key: str = f"surgecorr:{'|'.join(labels)}:{start_dt.to_iso8601_string()}:{end_dt.to_iso8601_string()}:{max_lag_hours}:{data_version}"
+
+    cached: Optional[str] = await cache.get(cache_key)
+    if cached:
+        logger.debug("Surge correlation served from REDIS")
+        return SurgeCorrelationResponse(**json.loads(cached))
+
+    start_h: np.datetime64 = np.datetime64(start_dt.naive(), "h")
+    hours: int = int((end_dt - start_dt).total_seconds() // 3600)
+    async with miss_limiter.slot():
+        try:
+            async with engine.connect() as conn:
+                with stage("db"):
+                    rows = (await conn.execute(text(STATIONS_READINGS_QUERY), params)).all()
+        except ConnectionError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception as e:
+            logger.error("Error fetching readings for the surge correlation: %s", e)
+            raise HTTPException(status_code=500, detail="Internal Server Error during data retrieval.")
+
+        with stage("reconstruct"):
+            series: np.ndarray = hourly_surge(labels, rows, start_h, hours)
+            result: Dict[str, np.ndarray] = lagged_correlation(series, max_lag_hours)
+
+    response = SurgeCorrelationResponse(
+        stations=labels,
+        start_date=start_dt.to_iso8601_string(),
+        end_date=end_dt.to_iso8601_string(),
+        max_lag_hours=max_lag_hours,
+        data_version=data_version,
+        pairs=[
+            SurgeCorrelation(
+                station_a=labels[i],
+                station_b=labels[j],
+                correlation=_rounded(result["lag0"][i, j]),
+                best_lag_hours=int(result["best_lag"][i, j]),
+                best_correlation=_rounded(result["best"][i, j]),
+                overlap_hours=int(result["overlap"][i, j]),
+            )
+            for i in range(len(labels)) for j in range(i + 1, len(labels))
+        ],
+    )
+
+    # The data version is part of the key, so a hit is never stale
+    cache.set(cache_key, response.model_dump_json(), ex=CACHE_TIME_LIMIT)
+    return response
+
+
+@router.get("/{station_label}/return-period", response_model=SurgeReturnPeriod)
+async def get_return_period(station_label: str, request: Request) -> SurgeReturnPeriod:
+    """
+    Endpoint that annotates the latest reading of the station with how rare its surge is: the return
+    period from the station's extreme value fit, refreshed nightly by db_scripts/surge_return_levels.py
+    """
+    engine: Optional[AsyncEngine] = getattr(request.app.state, "db_engine", None)
+    if engine is None:
+        raise HTTPException(status_code=503, detail="Database engine unavailable")
+
+    try:
+        async with miss_limiter.slot(), engine.connect() as conn:
+            with stage("db"):
+                row = (await conn.execute(text(RETURN_PERIOD_QUERY), {"station_label": station_label})).mappings().first()
+    except HTTPException:
+        raise
+    except ProgrammingError:
+        # surge_return_levels is created by the first run of the batch job
+        raise HTTPException(status_code=404, detail="No surge return levels fitted yet.")
+    except ConnectionError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error("Error fetching the return period of %s: %s", station_label, e)
+        raise HTTPException(status_code=500, detail="Internal Server Error during data retrieval.")
+
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"Station '{station_label}' not found.")
+    if row["method"] is None:
+        raise HTTPException(status_code=404, detail=f"No surge return levels fitted for '{station_label}' yet.")
+    terms: dict | None = tide_data.get_terms(station_label)
+    if row["date_time"] is None or terms is None:
+        raise HTTPException(status_code=404, detail=f"Station '{station_label}' has no readings or no coefficients.")
+
+    with stage("reconstruct"):
+        astro: float = float(predict(terms, np.array([row["date_time"]], dtype="datetime64[ns]"))[0])
+    surge: float = row["value"] - astro
+    fit: Dict[str, Any] = dict(row)
+    period: Optional[float] = extremes.return_period(fit, surge)
+    if period is not None:
+        status = "fitted"
+    elif extremes.below_threshold(fit, surge):
+        status = "below_threshold"
+    else:
+        status = "beyond_fit"
+
+    return SurgeReturnPeriod(
+        station_label=station_label,
+        date_time=row["date_time"].isoformat() + "Z",
+        value=row["value"],
+        astro=round(astro, 3),
+        surge=round(surge, 3),
+        return_period_status=status,
+        return_period_years=round(period, 2) if period is not None else None,
+        more_frequent_than_years=round(1 / fit["rate"], 2) if status == "below_threshold" else None,
+        method=f"{row['method']}/{row['block']}" if row["block"] else row["method"],
+        fitted_at=row["fitted_at"].isoformat(),
+        return_levels=row["levels"],
+    )
@@ -1,13 +1,219 @@
+'''
+Redis clients of the API.
+
+The cache goes through `ResilientCache`, on a sized connection pool with strict socket timeouts:
+  - reads fail soft: an error or timeout reads as a miss, so the endpoint falls back to Postgres
+  - several reads of a request are sent in one pipeline (one round trip)
+  - writes are fire-and-forget, they never add latency to the response
+  - a circuit breaker skips Redis altogether for a cooldown after consecutive failures, instead of
+    paying a timeout on every request while it is down
+
+Pub/sub (the readings streams) blocks on reads while the channel is quiet, so it uses its own
+client without the read timeout.
+'''
 import os
-from redis.asyncio import Redis
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from redis.asyncio import Redis, BlockingConnectionPool
+from redis.exceptions import RedisError
 from dotenv import load_dotenv
 
+from app.internal import metrics
+
 load_dotenv()
 
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+# Connections per worker, and how long a command waits for a free one
+REDIS_MAX_CONNECTIONS: int = int(os.getenv("REDIS_MAX_CONNECTIONS", 32))
+REDIS_POOL_TIMEOUT: float = float(os.getenv("REDIS_POOL_TIMEOUT", 0.1))
+# Seconds to connect and to wait for a reply; a cache that is slower than this is treated as down
+REDIS_CONNECT_TIMEOUT: float = float(os.getenv("REDIS_CONNECT_TIMEOUT", 0.5))
+REDIS_SOCKET_TIMEOUT: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", 0.25))
+# Consecutive failures that open the circuit, and seconds before a command is tried again
+REDIS_BREAKER_THRESHOLD: int = int(os.getenv("REDIS_BREAKER_THRESHOLD", 5))
+REDIS_BREAKER_COOLDOWN: float = float(os.getenv("REDIS_BREAKER_COOLDOWN", 10))
+# Cache writes in flight per worker; more are dropped rather than queued behind a slow Redis
+REDIS_MAX_PENDING_WRITES: int = int(os.getenv("REDIS_MAX_PENDING_WRITES", 256))
+
+logger = logging.getLogger(__name__)
+
+CACHE_BYPASS = metrics.register(metrics.Counter("tidenet_cache_bypass_total", "Cache commands skipped or failed, served without Redis", ["op", "reason"]))
+BREAKER_TRIPS = metrics.register(metrics.Counter("tidenet_redis_breaker_trips_total", "Times the circuit breaker opened after consecutive Redis failures"))
+
+# A command is (method name, *positional args), e.g. ("get", key) or ("set", key, value, ttl)
+Command = Tuple[Any, ...]
+
+
+class ResilientCache:
+    def __init__(self, client: Redis, threshold: int = REDIS_BREAKER_THRESHOLD, cooldown: float = REDIS_BREAKER_COOLDOWN, max_pending: int = REDIS_MAX_PENDING_WRITES):
+        self.client = client
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_pending = max_pending
+        self.failures = 0
+        self.open_until: Optional[float] = None
+        self._probing = False
+        self._pending: Set[asyncio.Task] = set()
+
+    @property
+    def is_open(self) -> bool:
+        return self.open_until is not None
+
+    def _allow(self) -> bool:
+        if self.open_until is None:
+            return True
+        # Half-open after the cooldown: one command at a time probes Redis
+        if time.monotonic() < self.open_until or self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def _success(self):
+        if self.open_until is not None:
+            logger.info("Redis is back, cache re-enabled")
+        self.failures = 0
+        self.open_until = None
+        self._probing = False
+
+    def _failure(self, op: str, err: BaseException):
+        CACHE_BYPASS.inc(op=op, reason="error")
+        metrics.REDIS_ERRORS.inc(op=op)
+        self.failures += 1
+        if self._probing or self.failures >= self.threshold:
+            if self.open_until is None:
+                BREAKER_TRIPS.inc()
+                logger.warning("Redis failing (%s: %s), bypassing the cache for %.0fs", type(err).__name__, err, self.cooldown)
+            self.open_until = time.monotonic() + self.cooldown
+        self._probing = False
+
+    async def _execute(self, commands: Sequence[Command]) -> List[Any]:
+        if len(commands) == 1:
+            name, *args = commands[0]
+            return [await getattr(self.client, name)(*args)]
+        async with self.client.pipeline(transaction=False) as pipe:
+            for name, *args in commands:
+                getattr(pipe, name)(*args)
+            return await pipe.execute()
+
+    async def read(self, *commands: Command) -> List[Any]:
+        '''
+        Run the commands in one round trip. Returns their replies, or None for every one of them
+        when Redis fails or the circuit is open.
+        '''
+        if not self._allow():
+            CACHE_BYPASS.inc(op="read", reason="open")
+            return [None] * len(commands)
+        try:
+            with metrics.stage("cache"):
+                replies = await self._execute(commands)
+        except (RedisError, OSError, asyncio.TimeoutError) as err:
+            self._failure("read", err)
+            return [None] * len(commands)
+        self._success()
+        return replies
+
+    async def get(self, key: str) -> Optional[str]:
+        return (await self.read(("get", key)))[0]
+
+    async def mget(self, keys: Sequence[str]) -> List[Optional[str]]:
+        if not keys:
+            return []
+        values = (await self.read(("mget", *keys)))[0]
+        return values if values is not None else [None] * len(keys)
+
+    async def set_nx(self, key: str, value: str, ex: int) -> bool:
+        '''
+        Set key with an expiry only if it doesn't exist yet, e.g. to take a lock. False when the
+        key exists, and when Redis fails or the circuit is open.
+        '''
+        if not self._allow():
+            CACHE_BYPASS.inc(op="read", reason="open")
+            return False
+        try:
+            with metrics.stage("cache"):
+                reply = await self.client.set(key, value, ex=ex, nx=True)
+        except (RedisError, OSError, asyncio.TimeoutError) as err:
+            self._failure("read", err)
+            return False
+        self._success()
+        return bool(reply)
+
+    def write(self, *commands: Command):
+        '''
+        Send the commands in the background (one pipeline); failures are only counted
+        '''
+        if not self._allow():
+            CACHE_BYPASS.inc(op="write", reason="open")
+            return
+        if len(self._pending) >= self.max_pending:
+            # Release a half-open probe, the write is not going to test anything
+            self._probing = False
+            CACHE_BYPASS.inc(op="write", reason="backlog")
+            return
+
+        async def send():
+            try:
+                await self._execute(commands)
+            except (RedisError, OSError, asyncio.TimeoutError) as err:
+                self._failure("write", err)
+            else:
+                self._success()
+
+        task = asyncio.create_task(send())
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    def set(self, key: str, value: str, ex: Optional[int] = None):
+        self.write(("set", key, value, ex))
+
+    def mset(self, mapping: Dict[str, str]):
+        if mapping:
+            self.write(("mset", mapping))
+
+    async def drain(self, timeout: float = 2.0):
+        '''
+        Wait (bounded) for the writes still in flight, on shutdown
+        '''
+        if self._pending:
+            await asyncio.wait(list(self._pending), timeout=timeout)
+
+
+pool = BlockingConnectionPool(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    decode_responses=True,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    timeout=REDIS_POOL_TIMEOUT,
+    socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+    health_check_interval=30,
+)
+redis = Redis(connection_pool=pool)
+cache = ResilientCache(redis)
+
+# Long-lived subscriptions (and the warm-up ping)
+pubsub_redis = Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True, socket_connect_timeout=REDIS_CONNECT_TIMEOUT, health_check_interval=30)
+
+
+def _collect() -> Dict[Tuple[str, ...], float]:
+    return {
+        ("breaker_open",): int(cache.is_open),
+        ("pending_writes",): len(cache._pending),
+        ("pool_in_use",): len(pool._in_use_connections),
+        ("pool_max",): pool.max_connections,
+    }
+
+
+metrics.register(metrics.Gauge("tidenet_redis_client", "State of the Redis cache client", ["state"], _collect))
+
+
+async def get_cache() -> ResilientCache:
+    return cache
 
-redis = Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
 
 async def get_redis():
-    return redis
\ No newline at end of file
+    return pubsub_redis
@@ -0,0 +1,92 @@
+'''
+Admission control for the expensive (cache miss) work of the endpoints: database queries and tide
+predictions run under a per-worker concurrency limit.
+
+Requests beyond the limit wait in a bounded queue. When the queue is full, or a request has
+waited longer than the queue timeout, it is shed with a 503 and a Retry-After header instead of
+piling onto the database pool. Cache hits never take a slot, so they keep being served at full
+speed while the miss path is saturated.
+'''
+import os
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Tuple
+
+from fastapi import HTTPException
+from dotenv import load_dotenv
+
+from app.internal import metrics
+
+load_dotenv()
+# Cache-miss requests doing database/prediction work at once in a worker (about the DB pool size)
+ADMISSION_CONCURRENCY: int = int(os.getenv("ADMISSION_CONCURRENCY", 8))
+# Requests allowed to wait for a slot, and for how long, before they are shed
+ADMISSION_QUEUE_SIZE: int = int(os.getenv("ADMISSION_QUEUE_SIZE", 32))
+ADMISSION_QUEUE_TIMEOUT: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 2.0))
+ADMISSION_RETRY_AFTER: int = int(os.getenv("ADMISSION_RETRY_AFTER", 2))
+
+SHED_REQUESTS = metrics.register(metrics.Counter("tidenet_admission_shed_total", "Requests shed by admission control", ["pool", "reason"]))
+QUEUE_WAIT = metrics.register(metrics.Histogram("tidenet_admission_wait_seconds", "Time spent waiting for an admission slot", ["pool"]))
+
+
+class AdmissionLimiter:
+    def __init__(self, name: str, limit: int, queue_size: int, timeout: float, retry_after: int):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.queued = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    def _shed(self, reason: str) -> HTTPException:
+        SHED_REQUESTS.inc(pool=self.name, reason=reason)
+        return HTTPException(
+            status_code=503,
+            detail="Server busy, please retry shortly.",
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        '''
+        Hold one slot for the block, queueing for it if all are taken (raises the 503 when shed)
+        '''
+        if self._semaphore.locked():
+            if self.queued >= self.queue_size:
+                raise self._shed("queue_full")
+            self.queued += 1
+            start = time.perf_counter()
+            try:
+                with metrics.stage("queue"):
+                    await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                raise self._shed("timeout")
+            finally:
+                self.queued -= 1
+                QUEUE_WAIT.observe(time.perf_counter() - start, pool=self.name)
+        else:
+            await self._semaphore.acquire()
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+
+miss_limiter = AdmissionLimiter("miss", ADMISSION_CONCURRENCY, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT, ADMISSION_RETRY_AFTER)
+
+
+def _collect() -> Dict[Tuple[str, ...], float]:
+    return {
+        (miss_limiter.name, "in_flight"): miss_limiter.in_flight,
+        (miss_limiter.name, "queued"): miss_limiter.queued,
+        (miss_limiter.name, "limit"): miss_limiter.limit,
+    }
+
+
+metrics.register(metrics.Gauge("tidenet_admission_requests", "Requests holding or waiting for an admission slot", ["pool", "state"], _collect))
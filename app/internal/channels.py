@@ -0,0 +1,7 @@
+'''
+Redis pub/sub channels shared by the API and the ingest scripts. Kept free of imports so
+db_scripts can use it without the API's dependencies.
+'''
+
+# New readings committed by the ingest, as {"station_label": ..., "readings": [[date_time, value], ...]}
+READINGS_CHANNEL = "readings:new"
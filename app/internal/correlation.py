@@ -0,0 +1,62 @@
+'''
+Lagged correlation of the surge of several stations, all pairs at once.
+
+The series share an hourly grid with NaN for missing readings. Every term of the Pearson
+correlation over the overlapping samples (counts, sums and sums of squares) is a cross-correlation
+of the series or of their masks, so they are computed for every pair and every lag from one FFT of
+each series (masked normalised cross-correlation).
+'''
+import numpy as np
+from typing import Dict
+
+
+def lagged_correlation(series: np.ndarray, max_lag: int, min_overlap: int = 24) -> Dict[str, np.ndarray]:
+    '''
+    Pearson correlation of every pair of rows of `series` (stations x samples, NaN = missing)
+    at every lag in [-max_lag, max_lag] samples. Lag l compares row i at t with row j at t + l,
+    so a positive best lag means the surge reaches station j after station i.
+
+    :param min_overlap: Lags with fewer samples present in both series are ignored
+    :return: Dict of stations x stations arrays: "lag0" (correlation without lag), "best_lag",
+        "best" (correlation at best_lag) and "overlap" (samples behind best)
+    '''
+    k, n = series.shape
+    max_lag = min(max_lag, n - 1)
+    mask = ~np.isnan(series)
+    x = np.where(mask, series, 0.0)
+    m = mask.astype(float)
+
+    # Zero padded to at least 2n so the circular correlation holds every linear lag
+    nfft = 1 << int(np.ceil(np.log2(2 * n)))
+    X, X2, M = (np.fft.rfft(a, nfft, axis=1) for a in (x, x * x, m))
+
+    def xcorr(A: np.ndarray, B: np.ndarray) -> np.ndarray:
+        # sum_t a_i[t] * b_j[t + l] for every pair (i, j), lags -max_lag..max_lag
+        c = np.fft.irfft(np.conj(A)[:, None, :] * B[None, :, :], nfft, axis=2)
+        return np.concatenate((c[..., nfft - max_lag:], c[..., :max_lag + 1]), axis=2)
+
+    count = np.rint(xcorr(M, M))
+    sum_i, sum_j = xcorr(X, M), xcorr(M, X)
+    sum_ii, sum_jj = xcorr(X2, M), xcorr(M, X2)
+    sum_ij = xcorr(X, X)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = sum_ij - sum_i * sum_j / count
+        var_i = sum_ii - sum_i ** 2 / count
+        var_j = sum_jj - sum_j ** 2 / count
+        r = cov / np.sqrt(var_i * var_j)
+    r[(count < min_overlap) | ~np.isfinite(r)] = np.nan
+    r = np.clip(r, -1.0, 1.0)
+
+    lags = np.arange(-max_lag, max_lag + 1)
+    valid = ~np.all(np.isnan(r), axis=2)
+    best_idx = np.argmax(np.where(np.isnan(r), -np.inf, r), axis=2)
+    best = np.take_along_axis(r, best_idx[..., None], axis=2)[..., 0]
+    overlap = np.take_along_axis(count, best_idx[..., None], axis=2)[..., 0]
+
+    return {
+        "lag0": r[..., max_lag],
+        "best_lag": np.where(valid, lags[best_idx], 0),
+        "best": np.where(valid, best, np.nan),
+        "overlap": np.where(valid, overlap, 0).astype(int),
+    }
@@ -0,0 +1,52 @@
+'''
+Decoding of the hourly coverage bitmaps of the readings (the station_coverage table, maintained by
+the ingest scripts, see db_scripts/readings_coverage.py). Each row holds one UTC month of a station as 744
+bits (31 days); bit i is set when the station has a reading in the i-th hour of the month.
+'''
+import numpy as np
+from datetime import date
+from typing import Iterable, List, Tuple
+
+MONTH_BITS = 744
+
+
+def month_starts(start: np.datetime64, end: np.datetime64) -> List[date]:
+    '''
+    First days of the UTC months overlapping [start, end)
+    '''
+    months = np.arange(start.astype("datetime64[M]"), (end - np.timedelta64(1, "h")).astype("datetime64[M]") + 1)
+    return [m.astype("datetime64[D]").item() for m in months]
+
+
+def coverage_mask(rows: Iterable[Tuple[date, str]], start: np.datetime64, end: np.datetime64) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Hourly coverage of [start, end) from the (month, bits) rows of a station.
+    Months without a row count as not covered.
+
+    :return: The hours (datetime64[h]) and whether each one has a reading
+    '''
+    start, end = start.astype("datetime64[h]"), end.astype("datetime64[h]")
+    hours = np.arange(start, end)
+    covered = np.zeros(hours.size, dtype=bool)
+
+    for month, bits in rows:
+        month_start = np.datetime64(month, "h")
+        month_hours = int((np.datetime64(month, "M") + 1 - month_start) / np.timedelta64(1, "h"))
+        offset = int((month_start - start) / np.timedelta64(1, "h"))
+        # The bits past the end of shorter months are unused
+        month_bits = np.frombuffer(bits[:month_hours].encode("ascii"), dtype=np.uint8) == ord("1")
+        # Overlap of the month's hours with the requested ones
+        lo, hi = max(offset, 0), min(offset + month_bits.size, hours.size)
+        if lo < hi:
+            covered[lo:hi] = month_bits[lo - offset:hi - offset]
+    return hours, covered
+
+
+def gaps(hours: np.ndarray, covered: np.ndarray) -> List[Tuple[np.datetime64, np.datetime64]]:
+    '''
+    The runs of hours without readings as [start, end) pairs
+    '''
+    missing = np.concatenate(([False], ~covered, [False])).astype(np.int8)
+    edges = np.flatnonzero(np.diff(missing))
+    step = np.timedelta64(1, "h")
+    return [(hours[s], hours[e - 1] + step) for s, e in zip(edges[::2], edges[1::2])]
@@ -0,0 +1,87 @@
+'''
+Return periods of surge levels from the extreme value fits of db_scripts/surge_return_levels.py.
+
+A fit is either a GEV of block maxima (annual, or monthly for short records) or a GPD of the
+declustered peaks over a threshold, with `rate` peaks a year. The shape is xi (positive for a heavy
+tail, i.e. minus scipy's `c`). The distribution functions are closed form so the API doesn't need scipy.
+'''
+import math
+from typing import Dict, Optional
+
+# Return periods (years) the batch job stores levels for
+RETURN_PERIODS = (2, 5, 10, 20, 50, 100, 200)
+
+
+def _gev_cdf(x: float, loc: float, scale: float, shape: float) -> float:
+    z = (x - loc) / scale
+    if abs(shape) < 1e-9:
+        return math.exp(-math.exp(-z))
+    t = 1 + shape * z
+    if t <= 0:
+        # Below the lower end (heavy tail) or above the upper end (bounded tail) of the support
+        return 0.0 if shape > 0 else 1.0
+    return math.exp(-t ** (-1 / shape))
+
+
+def _gev_ppf(p: float, loc: float, scale: float, shape: float) -> float:
+    y = -math.log(p)
+    if abs(shape) < 1e-9:
+        return loc - scale * math.log(y)
+    return loc + scale * (y ** -shape - 1) / shape
+
+
+def _gpd_sf(y: float, scale: float, shape: float) -> float:
+    if abs(shape) < 1e-9:
+        return math.exp(-y / scale)
+    t = 1 + shape * y / scale
+    return 0.0 if t <= 0 else t ** (-1 / shape)
+
+
+def _gpd_isf(q: float, scale: float, shape: float) -> float:
+    if abs(shape) < 1e-9:
+        return -scale * math.log(q)
+    return scale * (q ** -shape - 1) / shape
+
+
+def below_threshold(fit: Dict, level: float) -> bool:
+    '''
+    Whether level is at or below the threshold of a GPD fit. The fit only describes the peaks above
+    it, so all it says of such a level is that it is reached more often than every 1 / rate years.
+    '''
+    return fit["method"] == "gpd" and level <= fit["threshold"]
+
+
+def annual_exceedance(fit: Dict, level: float) -> Optional[float]:
+    '''
+    Probability that the surge exceeds level at least once in a year (for GPD, the expected number
+    of exceeding peaks a year, which is the same for rare levels), or None below a GPD threshold
+    '''
+    if fit["method"] == "gpd":
+        if below_threshold(fit, level):
+            return None
+        return fit["rate"] * _gpd_sf(level - fit["threshold"], fit["scale"], fit["shape"])
+    blocks = 12 if fit["block"] == "month" else 1
+    return 1 - _gev_cdf(level, fit["loc"], fit["scale"], fit["shape"]) ** blocks
+
+
+def return_period(fit: Dict, level: float) -> Optional[float]:
+    '''
+    Years between surges of at least level, or None when the fit can't tell: below a GPD threshold
+    (see below_threshold), or beyond the fitted distribution (above the upper end of a bounded tail)
+    '''
+    p = annual_exceedance(fit, level)
+    return 1 / p if p else None
+
+
+def return_level(fit: Dict, years: float) -> Optional[float]:
+    '''
+    Surge exceeded on average once every `years`, or None when the fit can't resolve it
+    (a GPD period shorter than the time between its peaks)
+    '''
+    if fit["method"] == "gpd":
+        q = 1 / (years * fit["rate"])
+        if q >= 1:
+            return None
+        return fit["threshold"] + _gpd_isf(q, fit["scale"], fit["shape"])
+    blocks = 12 if fit["block"] == "month" else 1
+    return _gev_ppf((1 - 1 / years) ** (1 / blocks), fit["loc"], fit["scale"], fit["shape"])
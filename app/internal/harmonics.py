@@ -0,0 +1,178 @@
+import time
+
+import numpy as np
+
+# utide datenums are proleptic Gregorian ordinals, so 1970-01-01 is day 719163
+_UNIX_EPOCH_DATENUM = 719163.0
+_NS_PER_DAY = 86400e9
+
+
+def to_datenum(t) -> np.ndarray:
+    '''
+    Convert timezone-naive UTC datetimes to utide datenums (float days)
+    '''
+    ns = np.asarray(t, dtype="datetime64[ns]").astype(np.int64)
+    return ns / _NS_PER_DAY + _UNIX_EPOCH_DATENUM
+
+
+def harmonic_terms(coef, min_SNR: float = 2, min_PE: float = 0) -> dict:
+    '''
+    Select the constituents utide.reconstruct would use and precompute everything
+    that does not depend on time.
+    Uses the same SNR/PE selection as utide.reconstruct (defaults min_SNR=2, min_PE=0).
+    '''
+    aux = coef["aux"]
+    opt = aux["opt"]
+
+    if (min_SNR == 0 and min_PE == 0) or opt["nodiagn"]:
+        ind = np.ones(len(coef["A"]), dtype=bool)
+    else:
+        E = coef["A"] ** 2
+        N = (coef["A_ci"] / 1.96) ** 2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            SNR = E / N
+            PE = 100 * E / E.sum()
+            ind = np.logical_and(SNR >= min_SNR, PE >= min_PE)
+
+    return {
+        "A": np.asarray(coef["A"])[ind],
+        "g": np.deg2rad(np.asarray(coef["g"])[ind]),
+        "frq": np.asarray(aux["frq"])[ind],
+        "lind": np.asarray(aux["lind"])[ind],
+        "lat": aux["lat"],
+        "reftime": aux["reftime"],
+        "mean": coef["mean"],
+        "slope": 0.0 if opt["notrend"] else coef["slope"],
+        "ngflgs": [opt["nodsatlint"], opt["nodsatnone"], opt["gwchlint"], opt["gwchnone"]],
+    }
+
+
+def _nodal_knots(terms: dict, tn: np.ndarray, knot_days: float):
+    '''
+    Nodal/satellite corrections (F, U) and the astronomical argument (V) change slowly
+    compared to the sampling step, so evaluate them once per knot and carry the phase
+    forward linearly with each constituent's frequency.
+    '''
+    # utide pulls in scipy.signal on import, so only load it once a prediction is needed
+    from utide.harmonics import FUV
+
+    origin = np.floor(tn.min())
+    k = np.floor((tn - origin) / knot_days).astype(np.int64)
+    knots = origin + knot_days * np.arange(k.max() + 1)
+    F, U, V = FUV(knots, terms["reftime"], terms["lind"], terms["lat"], terms["ngflgs"])
+    return k, knots, F, U + V
+
+
+def predict(terms: dict, t, derivative: bool = False, knot_days: float = 1.0, chunk: int = 1 << 15):
+    '''
+    Vectorised equivalent of utide.reconstruct(t, coef).h.
+
+    Args:
+        terms: Output of harmonic_terms()
+        t: timezone-naive UTC datetimes (anything np.datetime64 accepts)
+        derivative: Also return dh/dt in metres per hour
+        knot_days: Spacing of the nodal correction knots in days
+        chunk: Number of samples evaluated per block to bound memory use
+    Returns:
+        h, or (h, dh/dt) when derivative is True
+    '''
+    tn = to_datenum(t)
+    h = np.empty(tn.shape, dtype=float)
+    dh = np.empty(tn.shape, dtype=float) if derivative else None
+    if tn.size == 0:
+        return (h, dh) if derivative else h
+
+    k, knots, F, UV = _nodal_knots(terms, tn, knot_days)
+    A, g, frq = terms["A"], terms["g"], terms["frq"]
+    omega = 2 * np.pi * frq  # rad per hour
+
+    for i in range(0, tn.size, chunk):
+        sl = slice(i, i + chunk)
+        ki = k[sl]
+        hours = 24 * (tn[sl] - knots[ki])
+        phase = 2 * np.pi * UV[ki] + hours[:, None] * omega - g
+        amp = F[ki] * A
+        h[sl] = np.einsum("ij,ij->i", amp, np.cos(phase))
+        if derivative:
+            dh[sl] = -np.einsum("ij,ij->i", amp * omega, np.sin(phase)) + terms["slope"] / 24
+
+    h += terms["mean"] + terms["slope"] * (tn - terms["reftime"])
+    return (h, dh) if derivative else h
+
+
+def _subset(terms: dict, ind) -> dict:
+    '''
+    The terms restricted to some constituents (an index array or boolean mask)
+    '''
+    return {**terms, "A": terms["A"][ind], "g": terms["g"][ind], "frq": terms["frq"][ind], "lind": terms["lind"][ind]}
+
+
+def _constituent_series(terms: dict, t) -> np.ndarray:
+    '''
+    The tide of each constituent on its own at t (samples x constituents, without the mean and trend)
+    '''
+    tn = to_datenum(t)
+    k, knots, F, UV = _nodal_knots(terms, tn, 1.0)
+    hours = 24 * (tn - knots[k])
+    return F[k] * terms["A"] * np.cos(2 * np.pi * UV[k] + hours[:, None] * (2 * np.pi * terms["frq"]) - terms["g"])
+
+
+def check_grid(start, days: int = 365, step_minutes: int = 60) -> np.ndarray:
+    '''
+    Regular timezone-naive UTC grid from start, on which pruned terms are checked against the full ones
+    '''
+    return np.datetime64(start, "m") + np.arange(days * 1440 // step_minutes) * np.timedelta64(step_minutes, "m")
+
+
+def compare_terms(terms: dict, pruned: dict, t) -> dict:
+    '''
+    Actual difference between the predictions of the full and the pruned terms at t (metres), and the
+    speedup of the pruned prediction
+    '''
+    start = time.perf_counter()
+    h_full = predict(terms, t)
+    full_time = time.perf_counter() - start
+    start = time.perf_counter()
+    h_pruned = predict(pruned, t)
+    pruned_time = time.perf_counter() - start
+
+    err = h_pruned - h_full
+    return {
+        "rms": float(np.sqrt(np.mean(err ** 2))),
+        "max_abs": float(np.abs(err).max()),
+        "speedup": round(full_time / pruned_time, 2) if pruned_time > 0 else None,
+    }
+
+
+def prune_terms(terms: dict, max_rms: float, t=None) -> tuple[dict, dict]:
+    '''
+    Keep the fewest constituents whose dropped part stays within max_rms (metres) of the full prediction.
+
+    The constituents are dropped smallest amplitude first (the low SNR ones are already left out by
+    harmonic_terms). Each one adds about A^2/2 to the variance of the tide and distinct frequencies
+    are uncorrelated over a long span, so the RMS of the dropped part is bounded up front by
+    sqrt(sum(A^2/2)). When t is given the actual error is measured on it and constituents are given
+    back, largest first, until it is within max_rms (nodal factors and short spans can push it over).
+
+    Returns the pruned terms and a report: kept, total, rms_bound, and with t the measured
+    rms, max_abs and speedup (see compare_terms)
+    '''
+    total = terms["A"].size
+    order = np.argsort(terms["A"], kind="stable")
+    bound = np.sqrt(np.cumsum(terms["A"][order] ** 2 / 2))
+    n_drop = int(np.searchsorted(bound, max_rms, side="right"))
+
+    if t is not None and n_drop:
+        # The prediction is a sum over constituents, so the error is the sum of the dropped ones
+        dropped = _constituent_series(_subset(terms, order[:n_drop]), t)
+        err = dropped.sum(axis=1)
+        while n_drop and np.sqrt(np.mean(err ** 2)) > max_rms:
+            n_drop -= 1
+            err -= dropped[:, n_drop]
+
+    keep = np.sort(order[n_drop:])
+    pruned = _subset(terms, keep)
+    report = {"kept": int(keep.size), "total": int(total), "rms_bound": float(bound[n_drop - 1]) if n_drop else 0.0}
+    if t is not None:
+        report.update(compare_terms(terms, pruned, t))
+    return pruned, report
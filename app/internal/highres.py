@@ -0,0 +1,82 @@
+'''
+Codec of the high-resolution readings tier (the readings_highres table): all the readings of one
+station and UTC day, at the full EA rate (15 minutes), in a single row. Written by the ingest
+(db_scripts/readings_highres.py), read by /data for short windows.
+
+Times are stored as seconds since midnight and values are quantized to `quantum` metres (1 mm, the
+resolution the EA publishes, so the quantization is lossless for their data). Both series are
+delta-encoded, zigzag mapped (small negative deltas become small integers), byte-shuffled (the
+high bytes of every delta, nearly all zero, end up together) and zlib-compressed. A regular
+15-minute day is a few hundred bytes, against 96 rows plus their index entries in readings.
+'''
+import zlib
+import numpy as np
+from typing import Tuple
+
+# Metres per quantization step of the values
+QUANTUM = 0.001
+SECONDS_PER_DAY = 86400
+# Readings further apart than this are separate runs: the tier says nothing about the time between them
+RUN_GAP = np.timedelta64(1, "h")
+
+
+def _pack(series: np.ndarray) -> bytes:
+    deltas = np.diff(series.astype(np.int64), prepend=0).astype(np.int32)
+    zigzag = ((deltas << 1) ^ (deltas >> 31)).astype("<u4")
+    shuffled = zigzag.view(np.uint8).reshape(-1, 4).T
+    return zlib.compress(shuffled.tobytes(), 6)
+
+
+def _unpack(blob: bytes, count: int) -> np.ndarray:
+    zigzag = np.frombuffer(zlib.decompress(blob), dtype=np.uint8).reshape(4, count).T.copy().view("<u4").ravel()
+    deltas = (zigzag >> 1).astype(np.int64) ^ -(zigzag & 1).astype(np.int64)
+    return np.cumsum(deltas)
+
+
+def encode(seconds: np.ndarray, values: np.ndarray, quantum: float = QUANTUM) -> Tuple[bytes, bytes]:
+    '''
+    Compress the readings of a day: seconds since midnight (sorted, unique) and values in metres
+    '''
+    return _pack(seconds), _pack(np.round(np.asarray(values, dtype=float) / quantum))
+
+
+def decode(times: bytes, values: bytes, count: int, quantum: float = QUANTUM) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    The seconds since midnight and the values (metres) of a row written by encode()
+    '''
+    if count == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    # Rounded to strip the float noise of the multiplication
+    return _unpack(times, count), np.round(_unpack(values, count) * quantum, 6)
+
+
+def merge(seconds: np.ndarray, values: np.ndarray, new_seconds: np.ndarray, new_values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Union of the stored and the new readings of a day, sorted by time (a new value replaces a stored
+    one at the same second)
+    '''
+    all_seconds = np.concatenate([new_seconds, seconds]).astype(np.int64)
+    all_values = np.concatenate([new_values, values]).astype(float)
+    # np.unique keeps the first occurrence, the new reading
+    unique_seconds, first = np.unique(all_seconds, return_index=True)
+    return unique_seconds, all_values[first]
+
+
+def runs(times: np.ndarray, max_gap: np.timedelta64 = RUN_GAP) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    First and last times of the runs of sorted reading times (datetime64) with no gap of max_gap or more
+    '''
+    if times.size == 0:
+        return times[:0], times[:0]
+    breaks = np.flatnonzero(np.diff(times) >= max_gap)
+    return times[np.concatenate(([0], breaks + 1))], times[np.concatenate((breaks, [times.size - 1]))]
+
+
+def covered(times: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    '''
+    Whether each of times falls within one of the [start, end] runs (sorted, from runs())
+    '''
+    if starts.size == 0:
+        return np.zeros(times.shape, dtype=bool)
+    i = np.searchsorted(starts, times, side="right") - 1
+    return (i >= 0) & (times <= ends[np.maximum(i, 0)])
@@ -0,0 +1,126 @@
+'''
+Fan-out of newly ingested readings to the Server-Sent Events streams of the API.
+
+The ingest scripts publish every committed batch on the READINGS_CHANNEL Redis channel as
+{"station_label": ..., "readings": [[date_time, value], ...]}. Each worker holds a single
+subscription to it (started with the first stream) and pushes every batch, with the astronomical
+tide and surge computed once, to the queues of the streams open for that station.
+'''
+import json
+import asyncio
+import logging
+import numpy as np
+from typing import Any, Dict, List, Optional, Set
+
+from app.internal import tide_data
+from app.internal.channels import READINGS_CHANNEL
+from app.internal.harmonics import predict
+
+logger = logging.getLogger(__name__)
+
+# Batches a slow client may fall behind by before it is disconnected
+QUEUE_SIZE = 32
+
+
+def readings_event(station_label: str, date_times: List[str], values: List[float]) -> Dict[str, Any]:
+    '''
+    The SSE payload of a batch of readings, in the array layout of StationDataResponse
+    '''
+    terms: dict | None = tide_data.get_terms(station_label)
+    if terms is not None and date_times:
+        t = np.array([dt.rstrip("Z").split("+")[0] for dt in date_times], dtype="datetime64[ns]")
+        astro: List[float] = predict(terms, t).tolist()
+    else:
+        astro = [0.0] * len(values)
+
+    return {
+        "station_label": station_label,
+        "date_time": date_times,
+        "values": values,
+        "astro": astro,
+        "surge": [value - a for value, a in zip(values, astro)],
+    }
+
+
+def _end(queue: asyncio.Queue):
+    '''
+    Discard what is pending and tell the stream to finish
+    '''
+    while not queue.empty():
+        queue.get_nowait()
+    queue.put_nowait(None)
+
+
+class ReadingsBroadcaster:
+    def __init__(self):
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self.listener: Optional[asyncio.Task] = None
+
+    def subscribe(self, redis, station_label: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.subscribers.setdefault(station_label, set()).add(queue)
+        if self.listener is None or self.listener.done():
+            self.listener = asyncio.create_task(self.listen(redis))
+        return queue
+
+    def unsubscribe(self, station_label: str, queue: asyncio.Queue):
+        queues = self.subscribers.get(station_label)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[station_label]
+
+    def publish(self, message: Dict[str, Any]):
+        queues = self.subscribers.get(message.get("station_label", ""))
+        if not queues:
+            return
+
+        readings: List[List[Any]] = message.get("readings", [])
+        event = readings_event(message["station_label"], [r[0] for r in readings], [float(r[1]) for r in readings])
+        for queue in list(queues):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # The client isn't keeping up; end its stream (it reconnects with Last-Event-ID)
+                queues.discard(queue)
+                _end(queue)
+                logger.warning("Dropped a slow readings stream of %s", message["station_label"])
+
+    async def listen(self, redis):
+        '''
+        Hold the channel subscription, reconnecting with a backoff while Redis is unavailable
+        '''
+        delay = 1.0
+        while True:
+            try:
+                pubsub = redis.pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(READINGS_CHANNEL)
+                delay = 1.0
+                try:
+                    async for message in pubsub.listen():
+                        try:
+                            self.publish(json.loads(message["data"]))
+                        except Exception as e:
+                            logger.error("Malformed readings message: %s", e)
+                finally:
+                    await pubsub.aclose()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Readings subscription lost (%s), retrying in %.0fs", e, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+
+    async def close(self):
+        if self.listener is not None:
+            self.listener.cancel()
+            try:
+                await self.listener
+            except (asyncio.CancelledError, Exception):
+                pass
+        for queues in self.subscribers.values():
+            for queue in queues:
+                _end(queue)
+
+
+broadcaster = ReadingsBroadcaster()
@@ -0,0 +1,225 @@
+'''
+Minimal Prometheus instrumentation: counters and histograms rendered in the text exposition
+format, per-request stage timings and the ASGI middleware that reports them.
+
+Stages are timed with `stage()` inside the endpoints. The middleware observes them in the
+per-stage histograms (labelled with the route template) together with the end-to-end latency,
+and returns them to the client in a `Server-Timing` header.
+
+Metrics live in the memory of each worker process, so with several Gunicorn workers every
+scrape reports the worker that answered it.
+'''
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from redis.exceptions import RedisError
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(labels[n] for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (non-cumulative, last one is +Inf), sum]
+        self._values: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(labels[n] for n in self.labelnames)
+        i = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            entry = self._values.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0])
+            entry[0][i] += 1
+            entry[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    '''
+    Gauge whose values are read from a callback at scrape time; the callback returns
+    {label values: value}
+    '''
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], collect: Callable[[], Dict[Tuple[str, ...], float]]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for key, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+REGISTRY: List[Any] = []
+
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+def render() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+REQUEST_LATENCY = register(Histogram("tidenet_request_duration_seconds", "End-to-end request latency (except event streams)", ["route", "method", "status"]))
+# Event streams stay open for as long as the client is connected, which would swamp the latencies
+STREAM_DURATION = register(Histogram(
+    "tidenet_stream_duration_seconds", "Duration of Server-Sent Events connections", ["route"],
+    buckets=(1.0, 10.0, 60.0, 300.0, 900.0, 1800.0, 3600.0, 7200.0, 21600.0, 86400.0),
+))
+STAGE_HISTOGRAMS: Dict[str, Histogram] = {
+    "db": register(Histogram("tidenet_db_query_seconds", "Time spent querying the database", ["route"])),
+    "cache": register(Histogram("tidenet_cache_seconds", "Time spent reading and writing the Redis cache", ["route"])),
+    "reconstruct": register(Histogram("tidenet_reconstruct_seconds", "Time spent predicting the astronomical tide", ["route"])),
+    "serialize": register(Histogram("tidenet_serialization_seconds", "Time spent validating and serialising responses", ["route"])),
+}
+CACHE_OUTCOMES = register(Counter("tidenet_cache_requests_total", "Readings cache lookups by outcome (exact, stale, superset, miss)", ["outcome"]))
+REDIS_ERRORS = register(Counter("tidenet_redis_errors_total", "Failed Redis commands: cache reads and writes (served without Redis) and requests failed by a Redis error", ["op"]))
+
+
+def register_db_pool(get_engine: Callable[[], Any]):
+    '''
+    Expose the connection pool of the engine returned by get_engine (None while not started)
+    '''
+    def collect() -> Dict[Tuple[str, ...], float]:
+        engine = get_engine()
+        pool = getattr(getattr(engine, "sync_engine", engine), "pool", None)
+        if pool is None or not hasattr(pool, "checkedout"):
+            return {}
+        return {
+            ("size",): pool.size(),
+            ("checked_out",): pool.checkedout(),
+            ("checked_in",): pool.checkedin(),
+            ("overflow",): pool.overflow(),
+        }
+
+    register(Gauge("tidenet_db_pool_connections", "Database connection pool state", ["state"], collect))
+
+
+# (stage, seconds) recorded by the request being served
+_stages: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("stages", default=None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    '''
+    Time a block as one stage of the current request. Outside a request this does nothing.
+    '''
+    stages = _stages.get()
+    if stages is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages.append((name, time.perf_counter() - start))
+
+
+class MetricsMiddleware:
+    '''
+    ASGI middleware recording the end-to-end latency and stage timings of every HTTP request,
+    and adding them to the response as a Server-Timing header. Event streams (text/event-stream
+    responses) are recorded in STREAM_DURATION instead of the latency.
+    '''
+    def __init__(self, app, skip_paths: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.skip_paths = tuple(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        stages: List[Tuple[str, float]] = []
+        token = _stages.set(stages)
+        status = 500
+        streaming = False
+
+        async def send_with_timing(message):
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                streaming = any(name.lower() == b"content-type" and value.startswith(b"text/event-stream") for name, value in message.get("headers", []))
+                totals: Dict[str, float] = {}
+                for name, seconds in stages:
+                    totals[name] = totals.get(name, 0.0) + seconds
+                parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items()]
+                parts.append(f"total;dur={(time.perf_counter() - start) * 1000:.1f}")
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", ", ".join(parts).encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        except RedisError:
+            REDIS_ERRORS.inc(op="request")
+            raise
+        finally:
+            _stages.reset(token)
+            route = route_template(scope)
+            if streaming:
+                STREAM_DURATION.observe(time.perf_counter() - start, route=route)
+            else:
+                REQUEST_LATENCY.observe(time.perf_counter() - start, route=route, method=scope["method"], status=str(status))
+            for name, seconds in stages:
+                histogram = STAGE_HISTOGRAMS.get(name)
+                if histogram is not None:
+                    histogram.observe(seconds, route=route)
+
+
+def route_template(scope) -> str:
+    # The router stores the matched route in the scope; label by its template to bound cardinality
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
@@ -0,0 +1,123 @@
+'''
+Opt-in per-request profiling.
+
+The middleware is only installed when PROFILING_ENABLED is set, so there is no cost otherwise.
+Once enabled, a request is profiled when it carries an `X-Profile` header (equal to
+PROFILING_TOKEN when one is set) or is picked at PROFILING_SAMPLE_RATE. Every profile is written
+to PROFILING_DIR, named after the time, route, path and query parameters and the request duration.
+
+pyinstrument is used when installed (the `profiling` extra, `poetry install --extras profiling`,
+not part of the image), writing an HTML report, or speedscope JSON with PROFILING_FORMAT=speedscope.
+Otherwise the standard library cProfile writes a .prof file (open with snakeviz or pstats). cProfile
+sees the whole thread, so requests served concurrently show up in the same profile.
+
+One request is profiled at a time per worker: Python 3.12+ refuses a second active cProfile, and
+overlapping profiles would mostly show each other. A request selected while one is running is
+served unprofiled. The reports are rendered and written off the event loop.
+'''
+import os
+import re
+import time
+import asyncio
+import random
+import logging
+import cProfile
+from pathlib import Path
+from urllib.parse import unquote
+from typing import Optional
+
+from app.internal.metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "").lower() in ("1", "true", "yes")
+PROFILING_SAMPLE_RATE: float = float(os.getenv("PROFILING_SAMPLE_RATE", 0))
+PROFILING_TOKEN: str = os.getenv("PROFILING_TOKEN", "")
+PROFILING_DIR: Path = Path(os.getenv("PROFILING_DIR", "./logs/profiles"))
+PROFILING_FORMAT: str = os.getenv("PROFILING_FORMAT", "html")
+
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import SpeedscopeRenderer
+except ImportError:
+    Profiler = None
+
+# Whether a request of this worker is being profiled
+_active: bool = False
+
+
+def _slug(value: str, limit: int = 80) -> str:
+    return re.sub(r"[^A-Za-z0-9._=-]+", "-", value).strip("-")[:limit] or "root"
+
+
+class ProfilingMiddleware:
+    '''
+    ASGI middleware that profiles the selected requests and writes one file per request
+    '''
+    def __init__(self, app, directory: Path = PROFILING_DIR, sample_rate: float = PROFILING_SAMPLE_RATE, token: str = PROFILING_TOKEN):
+        self.app = app
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.token = token
+        self.directory.mkdir(parents=True, exist_ok=True)
+        logger.info("Request profiling enabled (%s, sample rate %s) into %s", "pyinstrument" if Profiler else "cProfile", sample_rate, directory)
+
+    def wanted(self, scope) -> bool:
+        header: Optional[bytes] = next((v for k, v in scope["headers"] if k == b"x-profile"), None)
+        if header is not None and (not self.token or header.decode() == self.token):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        global _active
+        if scope["type"] != "http" or not self.wanted(scope):
+            await self.app(scope, receive, send)
+            return
+        if _active:
+            logger.debug("Not profiling %s, another request is being profiled", scope["path"])
+            await self.app(scope, receive, send)
+            return
+
+        _active = True
+        start = time.perf_counter()
+        if Profiler is not None:
+            profiler = Profiler(async_mode="enabled")
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if Profiler is not None:
+                profiler.stop()
+            else:
+                profiler.disable()
+            _active = False
+            await asyncio.to_thread(self.write, profiler, scope, time.perf_counter() - start)
+
+    def write(self, profiler, scope, elapsed: float):
+        '''
+        Render and save the profile of a request (blocking, run in a thread)
+        '''
+        query: str = unquote(scope.get("query_string", b"").decode())
+        name = "_".join([
+            time.strftime("%Y%m%dT%H%M%S"),
+            _slug(route_template(scope)),
+            _slug(scope["path"]),
+            _slug(query),
+            f"{elapsed * 1000:.0f}ms",
+        ])
+        try:
+            if Profiler is None:
+                path = self.directory / f"{name}.prof"
+                profiler.dump_stats(path)
+            elif PROFILING_FORMAT == "speedscope":
+                path = self.directory / f"{name}.speedscope.json"
+                path.write_text(profiler.output(SpeedscopeRenderer()))
+            else:
+                path = self.directory / f"{name}.html"
+                path.write_text(profiler.output_html())
+            logger.info("Profile of %s?%s written to %s", scope["path"], query, path)
+        except Exception as e:
+            logger.error("Failed to write profile: %s", e)
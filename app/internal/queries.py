@@ -0,0 +1,121 @@
+'''
+SQL of the API's database reads, shared with db_scripts/explain_queries.py, which checks their
+plans. Kept free of the API's dependencies so db_scripts can import it.
+'''
+from typing import List, Literal
+
+
+# Readings of one station in a time window
+READINGS_QUERY: str = """
+    SELECT 
+        r.date_time AT TIME ZONE 'UTC' AS date_time, 
+        r.value, 
+        r.station_id, 
+        s.label AS station_label
+    FROM readings r
+    JOIN stations s ON r.station_id = s.station_id
+    WHERE s.label = :station_label
+        AND r.date_time BETWEEN :start_date AND :end_date
+    ORDER BY r.date_time ASC;
+"""
+
+# Latest reading of every station: one backward probe of the (station_id, date_time) index per
+# station (DISTINCT ON would sort the whole table)
+LATEST_READINGS_QUERY: str = """
+    SELECT
+        s.label,
+        s.station_id,
+        r.date_time AS latest_reading,
+        r.value,
+        s.lat,
+        s.long
+    FROM stations s
+    CROSS JOIN LATERAL (
+        SELECT date_time, value
+        FROM readings
+        WHERE station_id = s.station_id
+        ORDER BY date_time DESC
+        LIMIT 1
+    ) r
+    ORDER BY s.station_id;
+"""
+
+# Latest reading of a few stations, through the (station_id, date_time) key of readings
+LATEST_READINGS_OF_QUERY: str = """
+    SELECT
+        s.label,
+        s.station_id,
+        r.date_time AS latest_reading,
+        r.value,
+        s.lat,
+        s.long
+    FROM stations s
+    CROSS JOIN LATERAL (
+        SELECT date_time, value
+        FROM readings
+        WHERE station_id = s.station_id
+        ORDER BY date_time DESC
+        LIMIT 1
+    ) r
+    WHERE s.station_id = ANY(:station_ids);
+"""
+
+# Readings of several stations in a window, for their surge series
+STATIONS_READINGS_QUERY: str = """
+    SELECT
+        s.label,
+        r.date_time AT TIME ZONE 'UTC' AS date_time,
+        r.value
+    FROM readings r
+    JOIN stations s ON r.station_id = s.station_id
+    WHERE s.label = ANY(:labels)
+        AND r.date_time >= :start_date AND r.date_time < :end_date
+    ORDER BY s.label, r.date_time;
+"""
+
+# What a correlation depends on: how many readings each station has in the window and the latest one
+READINGS_VERSION_QUERY: str = """
+    SELECT s.label, count(r.date_time) AS readings, max(r.date_time) AS latest
+    FROM stations s
+    LEFT JOIN readings r
+        ON r.station_id = s.station_id AND r.date_time >= :start_date AND r.date_time < :end_date
+    WHERE s.label = ANY(:labels)
+    GROUP BY s.label;
+"""
+
+# Latest reading of a station with the extreme value fit of its surge (db_scripts/surge_return_levels.py)
+RETURN_PERIOD_QUERY: str = """
+    SELECT
+        r.date_time AT TIME ZONE 'UTC' AS date_time,
+        r.value,
+        f.method, f.block, f.loc, f.scale, f.shape, f.threshold, f.rate, f.levels, f.fitted_at
+    FROM stations s
+    LEFT JOIN LATERAL (
+        SELECT date_time, value FROM readings WHERE station_id = s.station_id ORDER BY date_time DESC LIMIT 1
+    ) r ON true
+    LEFT JOIN surge_return_levels f ON f.station_id = s.station_id
+    WHERE s.label = :station_label;
+"""
+
+
+def events_query(conditions: List[str], order: Literal["peak", "time"]) -> str:
+    """
+    Build the surge event listing query from the WHERE conditions (joined with AND)
+    """
+    where: str = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    order_by: str = "e.peak_surge DESC" if order == "peak" else "e.start_time DESC"
+
+    return f"""
+        SELECT
+            s.label AS station_label,
+            e.station_id,
+            e.start_time,
+            e.end_time,
+            e.peak_time,
+            e.peak_surge
+        FROM surge_events e
+        JOIN stations s ON e.station_id = s.station_id
+        {where}
+        ORDER BY {order_by}
+        LIMIT :limit;
+    """
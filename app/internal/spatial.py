@@ -0,0 +1,127 @@
+'''
+In-memory spatial index of the stations for the nearest and bounding-box endpoints.
+
+A haversine BallTree over the station coordinates is built on first use (or during warm-up) and
+rebuilt when the stations version changes. The version is a fingerprint of the (id, label, lat,
+long) rows of the stations table, checked at most every STATIONS_INDEX_REFRESH seconds, so
+adding or moving a station is picked up without a restart.
+'''
+import os
+import time
+import asyncio
+import logging
+import numpy as np
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from dotenv import load_dotenv
+
+load_dotenv()
+# Seconds between checks of the stations version
+STATIONS_INDEX_REFRESH: int = int(os.getenv("STATIONS_INDEX_REFRESH", 300))
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+
+STATIONS_VERSION_QUERY: str = """
+    SELECT md5(coalesce(string_agg(concat_ws(',', station_id, label, lat, long), ';' ORDER BY station_id), ''))
+    FROM stations;
+"""
+
+INDEXED_STATIONS_QUERY: str = """
+    SELECT station_id, label, lat, long
+    FROM stations
+    WHERE lat IS NOT NULL AND long IS NOT NULL
+    ORDER BY station_id;
+"""
+
+
+def _radians(lat, lon) -> np.ndarray:
+    return np.radians(np.column_stack([np.atleast_1d(lat), np.atleast_1d(lon)]).astype(float))
+
+
+class StationIndex:
+    def __init__(self):
+        self.version: Optional[str] = None
+        self.station_ids: np.ndarray = np.empty(0, dtype=np.int64)
+        self.labels: List[str] = []
+        self.coords: np.ndarray = np.empty((0, 2))
+        self.tree = None
+        self.checked_at: float = 0.0
+        self._lock = asyncio.Lock()
+
+    def build(self, version: str, rows: List[Tuple[int, str, float, float]]):
+        # Imported here to keep scikit-learn out of the import time of the app
+        from sklearn.neighbors import BallTree
+
+        self.station_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.labels = [row[1] for row in rows]
+        self.coords = np.array([(row[2], row[3]) for row in rows], dtype=float).reshape(-1, 2)
+        self.tree = BallTree(np.radians(self.coords), metric="haversine") if rows else None
+        self.version = version
+        logger.info("Built the spatial index of %d stations", len(rows))
+
+    async def refresh(self, engine: AsyncEngine, force: bool = False):
+        '''
+        Rebuild the index if the stations version has changed (checked once per refresh period)
+        '''
+        if not force and self.tree is not None and time.monotonic() - self.checked_at < STATIONS_INDEX_REFRESH:
+            return
+        async with self._lock:
+            if not force and self.tree is not None and time.monotonic() - self.checked_at < STATIONS_INDEX_REFRESH:
+                return
+            async with engine.connect() as conn:
+                version: str = (await conn.execute(text(STATIONS_VERSION_QUERY))).scalar_one()
+                if force or version != self.version:
+                    rows = (await conn.execute(text(INDEXED_STATIONS_QUERY))).all()
+                    self.build(version, [tuple(row) for row in rows])
+            self.checked_at = time.monotonic()
+
+    def nearest(self, lat: float, lon: float, k: int) -> List[Tuple[int, str, float]]:
+        '''
+        The k stations closest to the point as (station_id, label, distance in km), closest first
+        '''
+        if self.tree is None:
+            return []
+        k = min(k, len(self.labels))
+        distances, indices = self.tree.query(_radians(lat, lon), k=k)
+        return [
+            (int(self.station_ids[i]), self.labels[i], float(d) * EARTH_RADIUS_KM)
+            for d, i in zip(distances[0], indices[0])
+        ]
+
+    def within(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> List[Tuple[int, str]]:
+        '''
+        The stations inside the bounding box. A box with min_lon > max_lon crosses the antimeridian.
+        '''
+        if self.tree is None:
+            return []
+        width = (max_lon - min_lon) % 360 or (360.0 if max_lon != min_lon else 0.0)
+        if width >= 180:
+            # The circle around such a box covers most of the sphere; just filter everything
+            candidates = np.arange(len(self.labels))
+        else:
+            # Ball around the centre of the box through its farthest corner or edge midpoint,
+            # then the exact lat/lon test on what it returns
+            centre_lat = (min_lat + max_lat) / 2
+            centre_lon = min_lon + width / 2
+            edge_lats = [min_lat, centre_lat, max_lat, min_lat, max_lat, min_lat, centre_lat, max_lat]
+            edge_lons = [min_lon] * 3 + [centre_lon] * 2 + [min_lon + width] * 3
+            centre = _radians(centre_lat, centre_lon)
+            edges = _radians(edge_lats, edge_lons)
+            dlat, dlon = edges[:, 0] - centre[0, 0], edges[:, 1] - centre[0, 1]
+            a = np.sin(dlat / 2) ** 2 + np.cos(centre[0, 0]) * np.cos(edges[:, 0]) * np.sin(dlon / 2) ** 2
+            radius = 2 * np.arcsin(np.sqrt(np.clip(a, 0, 1))).max() * (1 + 1e-9)
+            candidates = self.tree.query_radius(centre, r=radius)[0]
+
+        lat, lon = self.coords[candidates, 0], self.coords[candidates, 1]
+        inside = (lat >= min_lat) & (lat <= max_lat) & ((lon - min_lon) % 360 <= width)
+        return sorted(
+            ((int(self.station_ids[i]), self.labels[i]) for i in candidates[inside]),
+            key=lambda item: item[1].lower(),
+        )
+
+
+station_index = StationIndex()
@@ -0,0 +1,86 @@
+'''
+Stale-while-revalidate for the cached responses.
+
+An entry is written with a hard TTL of its soft TTL plus CACHE_STALE_TIME. Up to the soft TTL it
+is fresh; after that it is still served at once, while one background task recomputes and
+rewrites it. The age comes from the remaining TTL of the key, read in the same round trip as the
+value, so the stored values are unchanged. Only after the hard TTL (the key is gone) does a
+request wait for the recompute itself.
+
+One refresh per key runs at a time: per worker through the set of keys being refreshed, and
+across workers through a short Redis lock (SET NX). Refreshes go through the admission limiter
+like any miss, so they are shed first when the database is saturated.
+'''
+import os
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Optional, Set
+
+from dotenv import load_dotenv
+
+from app.internal import metrics
+from app.dependencies.redis import ResilientCache
+
+load_dotenv()
+# Seconds an entry is still served after its soft TTL, while it is refreshed in the background
+CACHE_STALE_TIME: int = int(os.getenv("CACHE_STALE_TIME", 900))
+# Seconds another worker waits before retrying a refresh that didn't finish
+REFRESH_LOCK_TIME: int = 30
+
+logger = logging.getLogger(__name__)
+
+REFRESHES = metrics.register(metrics.Counter("tidenet_cache_refresh_total", "Background refreshes of stale cache entries", ["kind", "result"]))
+
+_refreshing: Set[str] = set()
+_tasks: Set[asyncio.Task] = set()
+
+
+def hard_ttl(soft_ttl: int) -> int:
+    '''
+    Expiry to write an entry with, so it can be served stale for CACHE_STALE_TIME after soft_ttl
+    '''
+    return soft_ttl + CACHE_STALE_TIME
+
+
+def is_stale(ttl: Optional[int]) -> bool:
+    '''
+    Whether an entry written with hard_ttl() is past its soft TTL, from its remaining TTL
+    (None when unknown, negative when the key has no expiry or is gone)
+    '''
+    return ttl is not None and 0 <= ttl < CACHE_STALE_TIME
+
+
+def revalidate(cache: ResilientCache, key: str, kind: str, refresh: Callable[[], Awaitable[Any]]):
+    '''
+    Run refresh (which recomputes and rewrites key) in the background, unless it is already
+    being refreshed here or by another worker. Failures are logged, the stale entry stays.
+    '''
+    if key in _refreshing:
+        return
+    _refreshing.add(key)
+
+    async def run():
+        try:
+            if not await cache.set_nx(f"refresh:{key}", "1", REFRESH_LOCK_TIME):
+                return
+            await refresh()
+            REFRESHES.inc(kind=kind, result="ok")
+        except Exception as e:
+            REFRESHES.inc(kind=kind, result="failed")
+            logger.warning("Refresh of %s failed: %s", key, e)
+        finally:
+            _refreshing.discard(key)
+
+    task = asyncio.create_task(run())
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def cancel():
+    '''
+    Stop the refreshes still running, on shutdown (before the database engine is disposed)
+    '''
+    for task in list(_tasks):
+        task.cancel()
+    if _tasks:
+        await asyncio.wait(list(_tasks))
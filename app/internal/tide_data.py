@@ -0,0 +1,167 @@
+'''
+In-memory registry of the static tide data of every station: the utide coefficients, their
+precomputed harmonic terms and the tide table. Every coef file also gets a version (a hash of its
+content) which keys the cached predictions, so they are recomputed only when the coefficients are refit.
+
+With TIDE_PRUNE_RMS set (metres), the terms keep only the constituents needed to stay within that
+RMS of the full prediction (see harmonics.prune_terms), checked over the current year. The version
+then also covers the pruning, so the cache never mixes pruned and full predictions.
+
+preload() reads everything under app/tide-data once. Under `gunicorn --preload` this happens in
+the master (see gunicorn.conf.py) so the workers share the data copy-on-write; otherwise the
+warm-up of each worker calls it. Stations missing from the registry are read from disk on
+first use and kept.
+'''
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from app.internal.harmonics import check_grid, harmonic_terms, prune_terms
+from app.internal.utilities import json_to_utide_coef
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+# RMS error (metres) allowed when pruning the constituents; 0 predicts with all of them
+TIDE_PRUNE_RMS: float = float(os.getenv("TIDE_PRUNE_RMS", 0))
+# The year the pruned constituents are checked over (and part of the version)
+_PRUNE_YEAR: int = datetime.now(timezone.utc).year
+
+TIDE_DATA_DIR = Path("./app/tide-data")
+
+_coefs: Dict[str, Any] = {}
+_versions: Dict[str, str] = {}
+_terms: Dict[str, dict] = {}
+_tables: Dict[str, Dict[str, float]] = {}
+_pruning: Dict[str, dict] = {}
+_preloaded: bool = False
+
+
+def _key(station_label: str) -> str:
+    # File names carry the label with dashes instead of spaces
+    return station_label.replace(" ", "-")
+
+
+def _load_coef_file(label: str, path: Path):
+    with open(path, "rb") as f:
+        content = f.read()
+    _coefs[label] = json_to_utide_coef(json.loads(content))
+    if TIDE_PRUNE_RMS > 0:
+        content += f"|prune:{TIDE_PRUNE_RMS}:{_PRUNE_YEAR}".encode()
+    _versions[label] = hashlib.sha1(content).hexdigest()[:12]
+
+
+def _build_terms(label: str, coef) -> dict:
+    terms = harmonic_terms(coef)
+    if TIDE_PRUNE_RMS > 0:
+        terms, _pruning[label] = prune_terms(terms, TIDE_PRUNE_RMS, check_grid(f"{_PRUNE_YEAR}-01-01"))
+    return terms
+
+
+def _load_table_file(path: Path) -> Dict[str, float]:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def preload():
+    '''
+    Read every coef file and tide table into memory (idempotent)
+    '''
+    global _preloaded
+    if _preloaded:
+        return
+
+    for path in (TIDE_DATA_DIR / "coef").glob("coef_*.json"):
+        label = path.stem.split("_", 2)[2]
+        _load_coef_file(label, path)
+        _terms[label] = _build_terms(label, _coefs[label])
+    for path in (TIDE_DATA_DIR / "tide-tables").glob("ttable_*"):
+        _tables[path.stem.split("_", 2)[2]] = _load_table_file(path)
+
+    _preloaded = True
+    logger.info("Preloaded tide data of %d stations", len(_coefs))
+    if _pruning:
+        reports = list(_pruning.values())
+        logger.info(
+            "Pruned the constituents to an RMS of %.4f m: %d of %d kept, worst measured RMS %.4f m (max %.4f m), %.2fx faster on average",
+            TIDE_PRUNE_RMS,
+            sum(r["kept"] for r in reports),
+            sum(r["total"] for r in reports),
+            max(r["rms"] for r in reports),
+            max(r["max_abs"] for r in reports),
+            sum(r["speedup"] or 1 for r in reports) / len(reports),
+        )
+
+
+def is_preloaded() -> bool:
+    return _preloaded
+
+
+def labels() -> List[str]:
+    '''
+    Labels (with dashes) of the stations with coefficients in the registry
+    '''
+    return sorted(_coefs)
+
+
+def get_coef(station_label: str) -> Optional[Any]:
+    '''
+    The utide coefficients of the station, or None if there isn't exactly one coef file for it
+    '''
+    label = _key(station_label)
+    if label not in _coefs and not _preloaded:
+        coefs = list((TIDE_DATA_DIR / "coef").rglob(f"coef_*_{label}*"))
+        if len(coefs) != 1:
+            return None
+        _load_coef_file(label, coefs[0])
+    return _coefs.get(label)
+
+
+def get_version(station_label: str) -> Optional[str]:
+    '''
+    Version of the coefficients of the station (changes whenever its coef file does), or None without them
+    '''
+    if get_coef(station_label) is None:
+        return None
+    return _versions.get(_key(station_label))
+
+
+def get_terms(station_label: str) -> Optional[dict]:
+    '''
+    The harmonic terms (see harmonics.harmonic_terms) of the station, or None without coefficients
+    '''
+    label = _key(station_label)
+    if label not in _terms:
+        coef = get_coef(station_label)
+        if coef is None:
+            return None
+        _terms[label] = _build_terms(label, coef)
+    return _terms[label]
+
+
+def get_pruning(station_label: str) -> Optional[dict]:
+    '''
+    What pruning the constituents of the station achieved (see harmonics.prune_terms), or None when not pruned
+    '''
+    if get_terms(station_label) is None:
+        return None
+    return _pruning.get(_key(station_label))
+
+
+def get_table(station_label: str) -> Optional[Dict[str, float]]:
+    '''
+    The static tide table (MHWS, MHWN, MLWS, MLWN, srange, nrange) of the station
+    '''
+    label = _key(station_label)
+    if label not in _tables and not _preloaded:
+        tables = list((TIDE_DATA_DIR / "tide-tables").rglob(f"ttable_*_{label}*"))
+        if len(tables) != 1:
+            return None
+        _tables[label] = _load_table_file(tables[0])
+    return _tables.get(label)
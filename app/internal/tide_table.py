@@ -1,110 +1,236 @@
-import utide
+'''
+Generates the static tide tables (MHWS, MHWN, MLWS, MLWN) for every station from its
+harmonic coefficients. Run from the repository root:
+
+    python -m app.internal.tide_table
+    python -m app.internal.tide_table --max-rms 0.005   # predict with the constituents pruned to a 5 mm RMS error
+'''
 import numpy as np
-import pandas as pd
-from scipy.signal import argrelextrema
 
-from tide_constants import json_to_utide_coef
+from app.internal.harmonics import check_grid, harmonic_terms, predict, prune_terms, to_datenum
+from app.internal.utilities import json_to_utide_coef
+
+# Period the static tables are averaged over
+TABLE_START = "2010-01-01"
+TABLE_END = "2026-01-01"
 
-def _predict_series(coef, start, end, freq="15min", tz="UTC"):
+def _predict_series(terms: dict, start, end, freq="15min", tz="UTC") -> tuple[np.ndarray, np.ndarray]:
     '''
     Reconstruct the astronomical tide for a given date range
+    Returns the timezone-naive UTC datetime64 grid and the tidal elevations on it
     '''
-    t = pd.date_range(start=start, end=end, freq=freq, tz=tz).tz_localize(None)
-    h = utide.reconstruct(t, coef, verbose=False).h
-    return pd.DataFrame({"t": t, "h": h})
-
-def _extract_extrema(df):
-    y = df["h"].to_numpy()
-    # sign changes of the first derivative mark turning points using a fast 1st order approximation
-    dy = np.diff(y)
-    sign = np.sign(dy)
-    change = np.diff(sign)
-    high_idx = np.where(change == -2)[0] + 1
-    low_idx = np.where(change == 2)[0] + 1
-    highs = df.iloc[high_idx].assign(kind="H")
-    lows = df.iloc[low_idx].assign(kind="L")
-    
-    return pd.concat([highs, lows]).sort_values("t").reset_index(drop=True)
+    import pandas as pd
+
+    t = pd.date_range(start=start, end=end, freq=freq, tz=tz).tz_localize(None).to_numpy()
+    h = predict(terms, t)
+    return t, h
+
+def _extract_extrema(t: np.ndarray, h: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Finds the high and low waters of a regularly sampled series.
+    Turning points are located from the sign changes of the first difference and then refined
+    with a parabola through the turning sample and its two neighbours, so the times and heights
+    are not quantised to the sampling step.
+    Returns the extrema times (datetime64), heights and kind (1 for High, -1 for Low), in time order
+    '''
+    dy = np.diff(h)
+    change = np.diff(np.sign(dy))
+    turn = np.flatnonzero(np.abs(change) == 2)
+    idx = turn + 1
+    kind = (-np.sign(change[turn])).astype(np.int8)
 
-def _daily_extreme_stats(peaks):
+    y0, y1, y2 = h[idx - 1], h[idx], h[idx + 1]
+    curvature = y0 - 2 * y1 + y2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        offset = np.where(curvature != 0, 0.5 * (y0 - y2) / curvature, 0.0)
+    offset = np.clip(offset, -1.0, 1.0)
+
+    step = (t[1] - t[0]).astype("timedelta64[ns]").astype(np.int64)
+    times = t[idx].astype("datetime64[ns]") + np.round(offset * step).astype("timedelta64[ns]")
+    heights = y1 - 0.25 * (y0 - y2) * offset
+
+    return times, heights, kind
+
+def _per_day(days: np.ndarray, values: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Time ordered reduction of values into calendar days: returns the days, max, min and mean
+    '''
+    unique_days, first = np.unique(days, return_index=True)
+    counts = np.diff(np.append(first, values.size))
+    return (
+        unique_days,
+        np.maximum.reduceat(values, first),
+        np.minimum.reduceat(values, first),
+        np.add.reduceat(values, first) / counts,
+    )
+
+def _daily_extreme_stats(times: np.ndarray, heights: np.ndarray, kind: np.ndarray) -> dict[str, np.ndarray]:
     '''
     Calculates the average High Water and the average Low Water each day
     In each day we expect 2 highs and 2 lows.
     It also computes useful stats such as the max Range <- will be used to determing the neaps and the springs
+    Only days that have both a high and a low water are kept.
     '''
-    days = peaks["t"].dt.floor("D")
-    highs = peaks.loc[peaks.kind == "H"].copy()
-    lows = peaks.loc[peaks.kind == "L"].copy()
+    days = times.astype("datetime64[D]")
+    highs = kind > 0
+    lows = ~highs
 
-    # Group by day
-    Hmax = highs.groupby(days.loc[highs.index]).h.max()
-    Havg = highs.groupby(days.loc[highs.index]).h.mean()
-    Lmin = lows.groupby(days.loc[lows.index]).h.min()
-    Lavg = lows.groupby(days.loc[lows.index]).h.mean()
+    h_days, Hmax, _, Havg = _per_day(days[highs], heights[highs])
+    l_days, _, Lmin, Lavg = _per_day(days[lows], heights[lows])
 
-    daily = pd.DataFrame({"Hmax": Hmax, "Havg": Havg, "Lmin": Lmin, "Lavg": Lavg}).dropna()
+    day, h_idx, l_idx = np.intersect1d(h_days, l_days, assume_unique=True, return_indices=True)
+    daily = {
+        "day": day,
+        "Hmax": Hmax[h_idx],
+        "Havg": Havg[h_idx],
+        "Lmin": Lmin[l_idx],
+        "Lavg": Lavg[l_idx],
+    }
     daily["range"] = daily["Hmax"] - daily["Lmin"]
     return daily
 
-def _spring_neap_days(daily: pd.DataFrame) -> tuple[pd.DatetimeIndex, pd.DatetimeIndex]:
+def _spring_neap_days(daily: dict[str, np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Returns the indices of the spring (max range) and neap (min range) days
+    '''
+    from scipy.signal import argrelextrema
+
     r = daily["range"]
-    
-    # Smoothing with a rolling window to remove slight deviations in range
-    # smooth = r.rolling(3, center=True, min_periods=1).mean()
-    
-    springs = r.index[argrelextrema(r.to_numpy(), np.greater, order=2)]
-    neaps = r.index[argrelextrema(r.to_numpy(), np.less, order=2)]
+    springs = argrelextrema(r, np.greater, order=2)[0]
+    neaps = argrelextrema(r, np.less, order=2)[0]
     
     return springs, neaps
 
-def tidal_means(coef, start, end, freq="10min", tz="UTC", datum_offset: float = 0.0):
+def tidal_means(terms: dict, start, end, freq="10min", tz="UTC", datum_offset: float = 0.0):
     """
     Returns MHWS, MHWN, MLWS, MLWN computed from predicted tides between start/end.
     Use at least one full year for stable averages.
+    terms: Output of harmonic_terms() (or prune_terms())
     """
-    series = _predict_series(coef, start, end, freq=freq, tz=tz)
+    t, h = _predict_series(terms, start, end, freq=freq, tz=tz)
         
-    peaks = _extract_extrema(series)
+    times, heights, kind = _extract_extrema(t, h)
 
-    daily = _daily_extreme_stats(peaks)
+    daily = _daily_extreme_stats(times, heights, kind)
         
     springs, neaps = _spring_neap_days(daily)
 
-    peaks["day"] = peaks["t"].dt.floor("D")
-    
-    # Compute daily mean highs/lows first, then average over selected days
-    Havg_by_day = daily["Havg"]
-    Lavg_by_day = daily["Lavg"]
-    
-    MHWS = float(np.round(daily["Havg"].reindex(springs).dropna().mean(),1))
-    MLWS = float(np.round(daily["Lavg"].reindex(springs).dropna().mean(),1))
-    MHWN = float(np.round(daily["Havg"].reindex(neaps).dropna().mean(),1))
-    MLWN = float(np.round(daily["Lavg"].reindex(neaps).dropna().mean(),1))
+    return _table(daily, springs, neaps)
 
-    return {"MHWS": MHWS, "MHWN": MHWN, "MLWS": MLWS, "MLWN": MLWN, "srange": MHWS - MLWS, "nrange": MHWN - MLWN}
 
+def _table(daily: dict[str, np.ndarray], springs: np.ndarray, neaps: np.ndarray, decimals: int = 1) -> dict[str, float]:
+    # Average the daily mean highs/lows over the selected days
+    MHWS = float(np.round(daily["Havg"][springs].mean(), decimals))
+    MLWS = float(np.round(daily["Lavg"][springs].mean(), decimals))
+    MHWN = float(np.round(daily["Havg"][neaps].mean(), decimals))
+    MLWN = float(np.round(daily["Lavg"][neaps].mean(), decimals))
 
-if __name__ == "__main__":
+    return {"MHWS": MHWS, "MHWN": MHWN, "MLWS": MLWS, "MLWN": MLWN, "srange": round(MHWS - MLWS, decimals), "nrange": round(MHWN - MLWN, decimals)}
+
+
+def hold_trend(terms: dict, epoch) -> dict:
+    '''
+    The terms with the fitted linear trend frozen at its level at epoch (added to the mean)
+    '''
+    level = terms["slope"] * (float(to_datenum(np.datetime64(epoch, "s"))) - terms["reftime"])
+    return {**terms, "mean": terms["mean"] + level, "slope": 0.0}
+
+
+def find_extremes(terms: dict, start, end, step: np.timedelta64 = np.timedelta64(10, "m"), iterations: int = 12) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Predicted high and low waters between start and end (timezone-naive UTC).
+    Turning points are bracketed by sign changes of the analytical derivative on a coarse grid
+    and then located by bisection on dh/dt, which converges to well under a second.
+    Returns the extrema times (datetime64), heights and kind (1 for High, -1 for Low), in time order
+    '''
+    t = np.arange(np.datetime64(start, "ns"), np.datetime64(end, "ns") + 1, step)
+    _, dh = predict(terms, t, derivative=True)
+
+    turn = np.flatnonzero(np.sign(dh[:-1]) * np.sign(dh[1:]) < 0)
+    kind = np.where(dh[turn] > 0, 1, -1).astype(np.int8)
+    lo = t[turn].astype("datetime64[ns]").astype(np.int64)
+    hi = t[turn + 1].astype("datetime64[ns]").astype(np.int64)
+
+    if turn.size:
+        for _ in range(iterations):
+            mid = lo + (hi - lo) // 2
+            _, dm = predict(terms, mid.astype("datetime64[ns]"), derivative=True)
+            # Still rising towards a high (or falling towards a low) means the root is after mid
+            before_root = dm * kind > 0
+            lo = np.where(before_root, mid, lo)
+            hi = np.where(before_root, hi, mid)
+
+    times = (lo + (hi - lo) // 2).astype("datetime64[ns]")
+    heights = predict(terms, times)
+    return times, heights, kind
+
+
+def yearly_tide_table(terms: dict, year: int, step: np.timedelta64 = np.timedelta64(30, "m")) -> dict[str, float]:
+    '''
+    MHWS, MHWN, MLWS, MLWN of a single (UTC) year, so the levels follow the 18.6-year nodal cycle.
+    Same method as tidal_means (the high and low waters are refined between the samples, so a coarse
+    step is enough), over the year padded by a couple of weeks so the springs and neaps at its ends
+    are still found. The fitted trend is held at the middle of the static tables' period: fitted on
+    a few years of data it is far steeper than sea level rise, and extrapolated it would swamp the
+    few centimetres of the nodal cycle. Levels are given to the centimetre for the same reason.
+    '''
+    midpoint = np.datetime64(TABLE_START, "D") + (np.datetime64(TABLE_END, "D") - np.datetime64(TABLE_START, "D")) // 2
+    terms = hold_trend(terms, midpoint)
+    start = np.datetime64(f"{year}-01-01", "D")
+    end = np.datetime64(f"{year + 1}-01-01", "D")
+    pad = np.timedelta64(16, "D")
+    t = np.arange((start - pad).astype("datetime64[ns]"), (end + pad).astype("datetime64[ns]"), step)
+    times, heights, kind = _extract_extrema(t, predict(terms, t))
+
+    daily = _daily_extreme_stats(times, heights, kind)
+    springs, neaps = _spring_neap_days(daily)
+    in_year = (daily["day"] >= start) & (daily["day"] < end)
+    return _table(daily, springs[in_year[springs]], neaps[in_year[neaps]], decimals=2)
+
+
+def calculate_table_for_station(coef_file, table_dir, start=TABLE_START, end=TABLE_END, freq="30min", max_rms: float = 0.0):
+    '''
+    Computes the tide table of a single station and writes it next to the others.
+    With max_rms (metres) the constituents are pruned first, checked over the first year.
+    Kept at module level so it can be pickled into the worker processes.
+    Returns the pruning report (see harmonics.prune_terms), or None without pruning
+    '''
     import json
-    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    with open(coef_file, "r") as f:
+        coef = json_to_utide_coef(json.load(f))
+
+    terms = harmonic_terms(coef)
+    report = None
+    if max_rms > 0:
+        terms, report = prune_terms(terms, max_rms, check_grid(start))
+
+    stats = tidal_means(terms, start=start, end=end, freq=freq, tz="UTC")
+
+    ttable_filename = coef_file.stem.replace("coef", "ttable")
+    ttable_file = table_dir.joinpath(ttable_filename)
+    with open(ttable_file, "w") as f:
+        json.dump(stats, f)
+    return report
+
+
+if __name__ == "__main__":
+    import os
+    import time
+    import argparse
+    from concurrent.futures import ProcessPoolExecutor, as_completed
     from pathlib import Path
     
     COEF_DIR = Path("./app/tide-data/coef")
     TABLE_DIR = Path("./app/tide-data/tide-tables")
     TABLE_DIR.mkdir(parents=False, exist_ok=True)
 
-    coef_files = list(COEF_DIR.rglob("coef*.json"))
-
-    def calculate_table_for_station(coef_file: Path):
-        with open(coef_file, "r") as f:
-            coef = json_to_utide_coef(json.load(f))
-
-        stats = tidal_means(coef, start="2010-01-01", end="2026-01-01", freq="30min", tz="UTC")
+    parser = argparse.ArgumentParser(description="Generate the static tide tables of every station")
+    parser.add_argument("--max-rms", type=float, default=0.0, help="Prune the constituents to this RMS error in metres (default: use them all)")
+    args = parser.parse_args()
 
-        ttable_filename = coef_file.stem.replace("coef", "ttable")
-        ttable_file = TABLE_DIR.joinpath(ttable_filename)
-        with open(ttable_file, "w") as f:
-            json.dump(stats, f)
+    coef_files = list(COEF_DIR.rglob("coef*.json"))
+    reports = {}
 
     def print_progress(done: int, total: int, bar_len: int = 30):
         frac = 0 if total == 0 else done / total
@@ -112,15 +238,25 @@ if __name__ == "__main__":
         bar = "#" * filled + "." * (bar_len - filled)
         print(f"[{bar}] {done}/{total}", end="\r", flush=True)
 
+    start = time.perf_counter()
     total = len(coef_files)
     done = 0
-    workers = min(8, max(1, total))
+    # The prediction is numpy bound, so use processes rather than threads to get past the GIL
+    workers = min(os.cpu_count() or 1, max(1, total))
     print_progress(0, total)
-    with ThreadPoolExecutor(max_workers=workers) as executor:
-        futures = [executor.submit(calculate_table_for_station, cf) for cf in coef_files]
-        for _ in as_completed(futures):
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(calculate_table_for_station, cf, TABLE_DIR, max_rms=args.max_rms): cf for cf in coef_files}
+        for future in as_completed(futures):
+            reports[futures[future].stem] = future.result()
             done += 1
             print_progress(done, total)
     if total:
         print_progress(total, total)
-        print()  # newline after progress bar
\ No newline at end of file
+        print()  # newline after progress bar
+    for name, report in sorted(reports.items()):
+        if report:
+            print(
+                f"{name}: {report['kept']}/{report['total']} constituents, RMS {report['rms'] * 1000:.1f} mm "
+                f"(bound {report['rms_bound'] * 1000:.1f} mm, max {report['max_abs'] * 1000:.1f} mm), {report['speedup']}x"
+            )
+    print(f"{time.perf_counter() - start:.2f}s")
@@ -1,10 +1,12 @@
 import numpy as np
-from utide.utilities import Bunch
 
 def json_to_utide_coef(data, is_bunch=True):
     '''
     Function to transform coefficient values from JSON to utide.Bunch
     '''
+    # Imported here so that importing the API doesn't load utide (and scipy.signal)
+    from utide.utilities import Bunch
+
     # 1. If it's a list convert to numpy array
     if isinstance(data, list):
         return np.array(data)
@@ -33,4 +35,4 @@ def colours(colour):
 
 def coloured_fn_name(colour):
     import inspect        
-    return f"{colours(colour)}[{inspect.currentframe().f_back.f_code.co_name}]{colours("ENDC")}" # type: ignore
\ No newline at end of file
+    return f"{colours(colour)}[{inspect.currentframe().f_back.f_code.co_name}]{colours('ENDC')}" # type: ignore
\ No newline at end of file
@@ -0,0 +1,79 @@
+'''
+Worker warm-up: everything a cold worker would otherwise do while serving its first requests.
+Runs in the background after startup; /ready answers 503 until it has finished.
+'''
+import os
+import time
+import asyncio
+import logging
+import numpy as np
+from typing import Any, Dict
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.internal import tide_data
+from app.internal.harmonics import predict
+from app.internal.spatial import station_index
+
+logger = logging.getLogger(__name__)
+
+# Connections opened ahead of the first requests (defaults to the pool size)
+WARMUP_DB_CONNECTIONS: int | None = int(os.environ["WARMUP_DB_CONNECTIONS"]) if os.getenv("WARMUP_DB_CONNECTIONS") else None
+
+
+def _warm_prediction():
+    '''
+    Load the tide data (a no-op when preloaded in the gunicorn master) and run one prediction,
+    which imports utide and touches the numpy code paths of the astronomical tide
+    '''
+    tide_data.preload()
+    terms = tide_data.get_terms(tide_data.labels()[0]) if tide_data.labels() else None
+    if terms is not None:
+        now = np.datetime64("now", "ns")
+        predict(terms, now + np.arange(48) * np.timedelta64(15, "m"), derivative=True)
+
+
+async def _open_pool_connections(engine: AsyncEngine, count: int):
+    async def touch():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    # Held concurrently so that `count` distinct connections end up in the pool
+    await asyncio.gather(*(touch() for _ in range(count)))
+
+
+async def warm_up(state: Any, redis) -> Dict[str, Any]:
+    '''
+    Warm the worker and mark state.ready. The steps run concurrently; failures are recorded but
+    don't keep the worker unready, as every step only makes the first requests faster.
+    '''
+    start = time.perf_counter()
+    engine: AsyncEngine | None = getattr(state, "db_engine", None)
+
+    async def database():
+        if engine is not None:
+            count = WARMUP_DB_CONNECTIONS if WARMUP_DB_CONNECTIONS is not None else engine.sync_engine.pool.size()
+            await _open_pool_connections(engine, count)
+
+    async def stations():
+        if engine is not None:
+            await station_index.refresh(engine)
+
+    steps = {
+        "tide_data": asyncio.to_thread(_warm_prediction),
+        "database": database(),
+        "station_index": stations(),
+        "redis": asyncio.wait_for(redis.ping(), timeout=2),
+    }
+    results = await asyncio.gather(*steps.values(), return_exceptions=True)
+    errors: Dict[str, str] = {
+        step: f"{type(result).__name__}: {result}" for step, result in zip(steps, results) if isinstance(result, BaseException)
+    }
+
+    state.warmup = {"seconds": round(time.perf_counter() - start, 3), "errors": errors}
+    state.ready = True
+    for step, err in errors.items():
+        logger.warning("Warm-up of %s failed: %s", step, err)
+    logger.info("Worker warm-up finished in %.2fs", state.warmup["seconds"])
+    return state.warmup
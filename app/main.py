@@ -1,5 +1,9 @@
+import os
+import asyncio
+import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from sqlalchemy import text
 from contextlib import asynccontextmanager
 
@@ -7,7 +11,12 @@ from sqlalchemy.ext.asyncio.engine import AsyncEngine
 
 from app.db import create_async_db_engine
 from .api import api
-from app.dependencies.redis import redis
+from app.dependencies.redis import cache, redis, pubsub_redis, get_redis
+from app.internal import live, metrics, profiling, swr
+from app.internal.warmup import warm_up
+
+# Per request logs are DEBUG; set LOG_LEVEL=DEBUG to see them
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format="[%(levelname)s] %(name)s: %(message)s")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -18,6 +27,8 @@ async def lifespan(app: FastAPI):
     
     print("Initializing SQLAlchemy Async Engine...")
     
+    engine: AsyncEngine | None = None
+    app.state.ready = False
     try:
         # Create the async engine and store it to the app state.
         engine: AsyncEngine = create_async_db_engine()
@@ -32,17 +43,30 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"CRITICAL ERROR: Failed to initialize SQLAlchemy engine. Check DATABASE_URL and driver. Details: {e}")
         
+    # Warm up in the background; /ready reports when it is done
+    # (through the same dependency as the endpoints, so overrides are honoured)
+    warmup_task = asyncio.create_task(warm_up(app.state, await app.dependency_overrides.get(get_redis, get_redis)()))
+
     yield # Application is now ready to serve requests
 
     # Shutdown phase: close connections
+    if not warmup_task.done():
+        warmup_task.cancel()
+    # Background cache refreshes use the engine
+    await swr.cancel()
     if engine:
         print("Disposing SQLAlchemy Engine...")
         await engine.dispose()
         print("Engine disposed.")
         
+    # End the open readings streams and their Redis subscription
+    await live.broadcaster.close()
+
     # Redis shutdown
     print("Closing Redis connection...")
-    await redis.close()
+    await cache.drain()
+    await redis.aclose()
+    await pubsub_redis.aclose()
     print("Redis connection closed.")
 
 
@@ -58,7 +82,33 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+# Stage timings and latency histograms (outermost, so it times the whole request)
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.register_db_pool(lambda: getattr(app.state, "db_engine", None))
+
+if profiling.PROFILING_ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics() -> PlainTextResponse:
+    """
+    Prometheus scrape endpoint (not proxied by nginx, scrape the backend directly)
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/ready", include_in_schema=False)
+async def get_ready() -> JSONResponse:
+    """
+    Readiness probe: 503 until the worker has finished warming up
+    """
+    if not getattr(app.state, "ready", False):
+        return JSONResponse({"status": "warming"}, status_code=503)
+    return JSONResponse({"status": "ready", "warmup": app.state.warmup})
+
 
 print("API backend started")
 
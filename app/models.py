@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Optional
 from pydantic_extra_types.pendulum_dt import DateTime
 
 class Reading(BaseModel):
@@ -28,6 +28,11 @@ class Station(BaseModel):
         from_attributes = True
 
 
+class NearbyStation(Station):
+    """A station with its great-circle distance from the queried point."""
+    distance_km: float
+
+
 class StationDataResponse(BaseModel):
     """Schema for the API response containing chart data."""
     station_id: int
@@ -43,4 +48,85 @@ class StationDataResponse(BaseModel):
 class StationTableResponse(BaseModel):
     """Schema for the API response containing chart data."""
     station_label: str
-    tidal_info: Dict[str, float]
\ No newline at end of file
+    tidal_info: Dict[str, float]
+    # Year the levels were computed for; None for the long-term table
+    year: Optional[int] = None
+
+class StationExtremesResponse(BaseModel):
+    """Schema for the API response containing predicted high and low waters."""
+    station_label: str
+    date_time: List[str]
+    height: List[float]
+    kind: List[str]
+    unit: str
+
+
+class StationPredictionResponse(BaseModel):
+    """Schema for the API response containing the astronomical tide prediction of the coming days."""
+    station_label: str
+    date_time: List[str]
+    astro: List[float]
+    step_minutes: int
+    coef_version: str
+    unit: str
+
+
+class StationCoverageResponse(BaseModel):
+    """Schema for the API response containing the hourly coverage of a station's readings."""
+    station_label: str
+    start: str
+    end: str
+    hours_expected: int
+    hours_covered: int
+    coverage: float
+    gaps: List[List[str]]
+
+
+class SurgeEvent(BaseModel):
+    """Schema for an indexed surge event (a run of readings above the surge threshold)."""
+    station_label: str
+    station_id: int
+    start_time: str
+    end_time: str
+    peak_time: str
+    peak_surge: float
+    duration_hours: float
+
+
+class SurgeCorrelation(BaseModel):
+    """Schema for the lagged surge correlation of a pair of stations (positive lag: the surge reaches station_b later)."""
+    station_a: str
+    station_b: str
+    correlation: Optional[float]
+    best_lag_hours: int
+    best_correlation: Optional[float]
+    overlap_hours: int
+
+
+class SurgeCorrelationResponse(BaseModel):
+    """Schema for the API response containing the pairwise surge correlation of a set of stations."""
+    stations: List[str]
+    start_date: str
+    end_date: str
+    max_lag_hours: int
+    data_version: str
+    pairs: List[SurgeCorrelation]
+
+class SurgeReturnPeriod(BaseModel):
+    """Schema for the API response annotating the latest reading of a station with the return period of its surge."""
+    station_label: str
+    date_time: str
+    value: float
+    astro: float
+    surge: float
+    # fitted: return_period_years is the estimate. below_threshold: the surge is below the threshold
+    # of the (GPD) fit, which only says it recurs more often than every more_frequent_than_years.
+    # beyond_fit: above the upper end of the fitted (bounded) tail
+    return_period_status: str
+    # Years between surges at least this high, when fitted
+    return_period_years: Optional[float]
+    more_frequent_than_years: Optional[float] = None
+    method: str
+    fitted_at: str
+    # Return period (years) -> surge (m)
+    return_levels: Dict[str, float]
@@ -0,0 +1,270 @@
+'''
+Reproducible latency benchmark of the API read paths.
+
+Seeds a throwaway PostgreSQL (pgserver, no container needed) or the database in
+BENCH_DATABASE_URL with synthetic stations and hourly readings, uses fakeredis (or the Redis
+in BENCH_REDIS_URL), and drives the FastAPI app in-process through an ASGI client.
+
+    pip install httpx fakeredis pgserver
+    python benchmarks/bench_api.py --stations 8 --days 180 --iterations 200 --output bench_results.json
+
+Cases:
+    exact_hit     /api/data/{station} with the exact window already cached
+    superset_hit  /api/data/{station} for sub-windows of a cached wider window
+    miss          /api/data/{station} with an empty cache (DB query + astronomical tide)
+    stations      /api/stations/ with an empty cache
+    tide_table    /api/data/{station}/table with an empty cache
+
+The report (p50/p95/p99/mean latency in ms and sequential throughput per case, plus the seed
+parameters and git commit) is printed and optionally written as JSON so runs can be compared.
+'''
+import os
+import io
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+import numpy as np
+import pendulum
+from pathlib import Path
+from contextlib import redirect_stdout
+from typing import Any, Awaitable, Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+# The app reads its tide data relative to the repository root
+os.chdir(ROOT)
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "db_scripts"))
+
+from app.internal.harmonics import harmonic_terms, predict
+from app.internal.utilities import json_to_utide_coef
+
+COEF_DIR = ROOT / "app" / "tide-data" / "coef"
+
+
+def start_database() -> tuple[str, Any]:
+    '''
+    Returns a SQLAlchemy psycopg URL and the server handle (None for BENCH_DATABASE_URL)
+    '''
+    url = os.getenv("BENCH_DATABASE_URL")
+    if url:
+        return url, None
+
+    import pgserver
+
+    server = pgserver.get_server(tempfile.mkdtemp(prefix="tidenet-bench-"), cleanup_mode="delete")
+    return server.get_uri().replace("postgresql://", "postgresql+psycopg://", 1), server
+
+
+def seed_database(url: str, stations: int, days: int, seed: int) -> List[str]:
+    '''
+    Create the schema and load hourly readings (astronomical tide + noise) for the first
+    `stations` coefficient files through COPY. Returns the station labels.
+    '''
+    import psycopg
+    from sqlalchemy import create_engine
+    from models import Base
+
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    rng = np.random.default_rng(seed)
+    end = pendulum.now("UTC").start_of("hour")
+    start = end.subtract(days=days)
+    times = np.arange(start.naive(), end.naive(), np.timedelta64(1, "h")).astype("datetime64[ns]")
+
+    coef_files = sorted(COEF_DIR.glob("coef_*.json"), key=lambda p: int(p.stem.split("_")[1]))[:stations]
+    labels: List[str] = []
+
+    with psycopg.connect(url.replace("postgresql+psycopg://", "postgresql://", 1)) as conn:
+        for coef_file in coef_files:
+            _, station_id, label = coef_file.stem.split("_", 2)
+            label = label.replace("-", " ")
+            labels.append(label)
+            notation = f"E{70000 + int(station_id)}"
+            with open(coef_file, "r") as f:
+                coef = json_to_utide_coef(json.load(f))
+
+            conn.execute(
+                "INSERT INTO stations (station_id, notation, label, lat, long, qualifier, unitname, created_at) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s, now())",
+                (int(station_id), notation, label, float(coef["aux"]["lat"]), -float(rng.uniform(0, 5)), f"Tidal Level {station_id}", f"mAOD {station_id}"),
+            )
+
+            values = predict(harmonic_terms(coef), times) + rng.normal(0, 0.08, times.size)
+            with conn.cursor().copy("COPY readings (station_id, date_time, value, unit_name, notation) FROM STDIN") as copy:
+                for t, v in zip(times.astype("datetime64[s]").astype(str), values.tolist()):
+                    copy.write_row((int(station_id), f"{t}+00", round(v, 3), "mAOD", notation))
+        conn.execute("ANALYZE")
+        conn.commit()
+
+    return labels
+
+
+def summarise(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    ms = np.array(latencies) * 1000
+    return {
+        "n": int(ms.size),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+        "throughput_rps": round(ms.size / elapsed, 1),
+    }
+
+
+async def measure(iterations: int, request: Callable[[int], Awaitable[Any]], before: Callable[[], Awaitable[Any]] | None = None) -> Dict[str, float]:
+    '''
+    Time `iterations` sequential calls of request(i). `before` runs untimed ahead of each call.
+    '''
+    # Warm up code paths (imports, pool connections) outside the measurement
+    for i in range(3):
+        if before:
+            await before()
+        await request(i)
+
+    latencies: List[float] = []
+    elapsed = 0.0
+    for i in range(iterations):
+        if before:
+            await before()
+        start = time.perf_counter()
+        await request(i)
+        latency = time.perf_counter() - start
+        latencies.append(latency)
+        elapsed += latency
+    return summarise(latencies, elapsed)
+
+
+async def run_cases(db_url: str, labels: List[str], iterations: int, days: int, seed: int) -> Dict[str, Dict[str, float]]:
+    import httpx
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from app.main import app
+    from app.dependencies.redis import ResilientCache, get_cache, get_redis
+
+    redis_url = os.getenv("BENCH_REDIS_URL")
+    if redis_url:
+        from redis.asyncio import Redis
+        redis = Redis.from_url(redis_url, decode_responses=True)
+    else:
+        import fakeredis
+        redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+
+    cache = ResilientCache(redis)
+
+    async def override_redis():
+        return redis
+
+    async def override_cache():
+        return cache
+
+    app.dependency_overrides[get_redis] = override_redis
+    app.dependency_overrides[get_cache] = override_cache
+    app.state.db_engine = create_async_engine(db_url, pool_pre_ping=True)
+
+    rng = random.Random(seed)
+    end = pendulum.now("UTC").start_of("hour")
+    window = min(14, days // 2)
+
+    def fmt(dt: pendulum.DateTime) -> str:
+        return dt.format("YYYY-MM-DDTHH:mm:ss.SSS") + "Z"
+
+    def random_window(max_days: int) -> tuple[str, str]:
+        stop = end.subtract(hours=rng.randint(0, (days - max_days) * 24))
+        return fmt(stop.subtract(days=rng.randint(1, max_days))), fmt(stop)
+
+    results: Dict[str, Dict[str, float]] = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def get(path: str, **params):
+            res = await client.get(path, params=params or None)
+            assert res.status_code == 200, f"{path} -> {res.status_code}: {res.text[:200]}"
+
+        async def flush():
+            await redis.flushall()
+
+        label = labels[0]
+        exact_start, exact_end = fmt(end.subtract(days=window)), fmt(end)
+        await flush()
+        await get(f"/api/data/{label}", start_date=exact_start, end_date=exact_end)
+        # Cache writes are sent in the background
+        await cache.drain()
+        results["exact_hit"] = await measure(iterations, lambda i: get(f"/api/data/{label}", start_date=exact_start, end_date=exact_end))
+
+        await flush()
+        wide_start = end.subtract(days=days - 1)
+        await get(f"/api/data/{label}", start_date=fmt(wide_start), end_date=fmt(end))
+        await cache.drain()
+
+        async def superset(i: int):
+            stop = end.subtract(hours=rng.randint(0, 24 * (days - 1 - window)))
+            await get(f"/api/data/{label}", start_date=fmt(stop.subtract(days=window)), end_date=fmt(stop))
+
+        results["superset_hit"] = await measure(iterations, superset)
+
+        async def miss(i: int):
+            start_date, end_date = random_window(window)
+            await get(f"/api/data/{labels[i % len(labels)]}", start_date=start_date, end_date=end_date)
+
+        results["miss"] = await measure(iterations, miss, before=flush)
+        results["stations"] = await measure(iterations, lambda i: get("/api/stations/"), before=flush)
+        results["tide_table"] = await measure(iterations, lambda i: get(f"/api/data/{labels[i % len(labels)]}/table"), before=flush)
+
+    await app.state.db_engine.dispose()
+    await redis.aclose()
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=ROOT).stdout.strip()
+    except OSError:
+        return ""
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the API read paths in-process")
+    parser.add_argument("--stations", type=int, default=8)
+    parser.add_argument("--days", type=int, default=180, help="Days of hourly readings per station")
+    parser.add_argument("--iterations", type=int, default=200, help="Timed requests per case")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, help="Write the JSON report here")
+    args = parser.parse_args()
+
+    db_url, server = start_database()
+    try:
+        seed_start = time.perf_counter()
+        labels = seed_database(db_url, args.stations, args.days, args.seed)
+        seed_s = time.perf_counter() - seed_start
+
+        # The endpoints log every request to stdout; keep that out of the report
+        with redirect_stdout(io.StringIO()):
+            results = asyncio.run(run_cases(db_url, labels, args.iterations, args.days, args.seed))
+    finally:
+        if server is not None:
+            server.cleanup()
+
+    report = {
+        "timestamp": pendulum.now("UTC").to_iso8601_string(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {**{k: v for k, v in vars(args).items() if k != "output"}, "seed_seconds": round(seed_s, 2)},
+        "results": results,
+    }
+
+    print(f"{'case':<14}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+    for case, stats in results.items():
+        print(f"{case:<14}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['throughput_rps']:>10.1f}")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"Report written to {args.output}")
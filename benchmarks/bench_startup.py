@@ -0,0 +1,109 @@
+'''
+Measure worker startup: the import time of app.main and the latency of the first requests
+after the lifespan startup (and warm-up, once /ready reports ready) has run.
+
+Each measurement runs in a fresh interpreter so nothing is imported or cached beforehand.
+Needs a database with readings (BENCH_DATABASE_URL, e.g. one seeded by bench_api.py or
+db_scripts/generate_synthetic.py) and uses fakeredis, so every first request is a cache miss.
+
+    BENCH_DATABASE_URL=postgresql+psycopg://... python benchmarks/bench_startup.py --runs 5
+'''
+import os
+import sys
+import json
+import argparse
+import subprocess
+import numpy as np
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+IMPORT_SNIPPET = '''
+import time
+start = time.perf_counter()
+import app.main
+print(time.perf_counter() - start)
+'''
+
+FIRST_REQUEST_SNIPPET = '''
+import io, sys, json, time, asyncio, contextlib
+import httpx, fakeredis, pendulum
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from app.main import app
+from app.dependencies.redis import ResilientCache, get_cache, get_redis
+
+redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+
+cache = ResilientCache(redis)
+
+async def override_redis():
+    return redis
+
+async def override_cache():
+    return cache
+
+app.dependency_overrides[get_redis] = override_redis
+app.dependency_overrides[get_cache] = override_cache
+
+async def main():
+    timings = {}
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            start = time.perf_counter()
+            # Trees without a readiness endpoint answer 404 and are measured straight away
+            while (await client.get("/ready")).status_code == 503:
+                await asyncio.sleep(0.01)
+            timings["ready_s"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            stations = await client.get("/api/stations/")
+            timings["first_stations_s"] = time.perf_counter() - start
+            label = sorted(stations.json())[0]
+            end = pendulum.now("UTC").start_of("hour")
+            for name, path, params in (
+                ("first_data_s", f"/api/data/{label}", {"start_date": end.subtract(days=14).format("YYYY-MM-DDTHH:mm:ss.SSS") + "Z", "end_date": end.format("YYYY-MM-DDTHH:mm:ss.SSS") + "Z"}),
+                ("first_table_s", f"/api/data/{label}/table", {}),
+                ("first_extremes_s", f"/api/data/{label}/extremes", {}),
+            ):
+                start = time.perf_counter()
+                res = await client.get(path, params=params)
+                timings[name] = time.perf_counter() - start
+                assert res.status_code == 200, res.text
+    sys.__stdout__.write(json.dumps(timings) + "\\n")
+
+with contextlib.redirect_stdout(io.StringIO()):
+    asyncio.run(main())
+'''
+
+
+def run_snippet(snippet: str, env: Dict[str, str]) -> str:
+    res = subprocess.run([sys.executable, "-c", snippet], cwd=ROOT, env=env, capture_output=True, text=True)
+    if res.returncode != 0:
+        raise RuntimeError(res.stderr)
+    return res.stdout.strip().splitlines()[-1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure app import time and first-request latency")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="Write the results as JSON")
+    args = parser.parse_args()
+
+    env = {**os.environ, "PYTHONPATH": str(ROOT), "LOG_LEVEL": "WARNING"}
+    if os.getenv("BENCH_DATABASE_URL"):
+        env["DATABASE_URL_SQLALCHEMY"] = os.environ["BENCH_DATABASE_URL"]
+
+    samples: Dict[str, List[float]] = {"import_s": []}
+    for _ in range(args.runs):
+        samples["import_s"].append(float(run_snippet(IMPORT_SNIPPET, env)))
+        for name, value in json.loads(run_snippet(FIRST_REQUEST_SNIPPET, env)).items():
+            samples.setdefault(name, []).append(value)
+
+    results = {name: {"median_ms": round(float(np.median(v)) * 1000, 1), "max_ms": round(max(v) * 1000, 1)} for name, v in samples.items()}
+    for name, stats in results.items():
+        print(f"{name:<18}{stats['median_ms']:>10.1f} ms (max {stats['max_ms']:.1f})")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
@@ -0,0 +1,220 @@
+'''
+Local stand-in for the EA flood-monitoring readings API, used to exercise fetch_latest.py
+without touching the real service.
+
+    python ea_standin.py                 # run fetch_latest's per station mode against an in-process stand-in
+    python ea_standin.py --bulk          # run fetch_latest's bulk mode against the recorded fixture
+    python ea_standin.py --serve         # only serve it (point API_ROOT at http://127.0.0.1:8089)
+    python ea_standin.py --record        # re-record the bulk fixture from the real API
+
+The per station listing generates 15-minute readings since the requested time. The bulk listing
+(/data/readings) replays fixtures/bulk_readings.json, shifted so its last reading is the current
+quarter hour. Both answer with 429 once more than --capacity requests are in flight, and can
+inject latency and random 5xx errors.
+'''
+import json
+import random
+import asyncio
+import argparse
+from aiohttp import web
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+
+def synthetic_readings(notation: str, since: datetime, until: datetime) -> List[Dict[str, Any]]:
+    # Seeded per station and window so every page of a listing comes from the same series
+    rng = random.Random(f"{notation}{since}")
+    measure = f"http://environment.data.gov.uk/flood-monitoring/id/measures/{notation}-level-tidal_level-Mean-15_min-mAOD"
+    readings = []
+    dt = since.replace(second=0, microsecond=0) + timedelta(minutes=15 - since.minute % 15)
+    while dt <= until:
+        stamp = dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+        readings.append({
+            "@id": f"{measure}/readings/{stamp}",
+            "dateTime": stamp,
+            "measure": measure,
+            "value": round(2 * rng.random() - 1, 3),
+        })
+        dt += timedelta(minutes=15)
+    return readings
+
+
+FIXTURE = Path(__file__).resolve().parent / "fixtures" / "bulk_readings.json"
+
+
+def load_bulk_fixture(now: datetime) -> List[Dict[str, Any]]:
+    '''
+    Load the recorded bulk readings and shift them so the last one falls on the current quarter hour
+    '''
+    with open(FIXTURE, "r") as f:
+        items = json.load(f)["items"]
+
+    def parse(stamp: str) -> datetime:
+        return datetime.fromisoformat(stamp.replace("Z", "+00:00"))
+
+    latest = max(parse(item["dateTime"]) for item in items)
+    shift = now.replace(minute=now.minute - now.minute % 15, second=0, microsecond=0) - latest
+    shifted = []
+    for item in items:
+        stamp = (parse(item["dateTime"]) + shift).strftime("%Y-%m-%dT%H:%M:%SZ")
+        shifted.append({**item, "@id": f"{item['measure']}/readings/{stamp}", "dateTime": stamp})
+    return shifted
+
+
+def make_app(latency: float = 0.05, error_rate: float = 0.0, capacity: int = 8) -> web.Application:
+    app = web.Application()
+    counters = {"in_flight": 0, "requests": 0}
+    app["counters"] = counters
+
+    async def station_readings(request: web.Request) -> web.Response:
+        counters["requests"] += 1
+        if counters["in_flight"] >= capacity:
+            return web.json_response({"error": "Too Many Requests"}, status=429, headers={"Retry-After": "1"})
+
+        counters["in_flight"] += 1
+        try:
+            # Latency grows with load, like the real service
+            await asyncio.sleep(latency * (1 + counters["in_flight"] / capacity))
+            if random.random() < error_rate:
+                return web.json_response({"error": "Service Unavailable"}, status=503)
+
+            notation = request.match_info["notation"]
+            since = datetime.fromisoformat(request.query["since"].replace("Z", "+00:00"))
+            limit = int(request.query.get("_limit", 500))
+            offset = int(request.query.get("_offset", 0))
+            items = synthetic_readings(notation, since, datetime.now(timezone.utc))
+            return web.json_response({"items": items[offset:offset + limit]})
+        finally:
+            counters["in_flight"] -= 1
+
+    async def bulk_readings(request: web.Request) -> web.Response:
+        counters["requests"] += 1
+        if counters["in_flight"] >= capacity:
+            return web.json_response({"error": "Too Many Requests"}, status=429, headers={"Retry-After": "1"})
+
+        counters["in_flight"] += 1
+        try:
+            await asyncio.sleep(latency * (1 + counters["in_flight"] / capacity))
+            items = load_bulk_fixture(datetime.now(timezone.utc))
+            if "latest" in request.query:
+                latest: Dict[str, Dict[str, Any]] = {}
+                for item in items:
+                    latest[item["measure"]] = item
+                items = list(latest.values())
+            elif "since" in request.query:
+                items = [item for item in items if item["dateTime"] > request.query["since"]]
+            limit = int(request.query.get("_limit", 500))
+            offset = int(request.query.get("_offset", 0))
+            return web.json_response({"items": items[offset:offset + limit]})
+        finally:
+            counters["in_flight"] -= 1
+
+    app.router.add_get("/id/stations/{notation}/readings", station_readings)
+    app.router.add_get("/data/readings", bulk_readings)
+    return app
+
+
+async def start_standin(app: web.Application) -> web.AppRunner:
+    import fetch_latest
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore
+    fetch_latest.API_ROOT = f"http://127.0.0.1:{port}"
+    return runner
+
+
+async def run_fetch(stations: int, days: int, app: web.Application):
+    import fetch_latest
+
+    runner = await start_standin(app)
+    since = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    latest_datetime_dict = {f"E{70000 + i}": since for i in range(stations)}
+
+    try:
+        results = await fetch_latest.fetch_all_stations(latest_datetime_dict)
+    finally:
+        await runner.cleanup()
+
+    expected = days * 96
+    short = [notation for result in results for notation, items in result.items() if len(items) < expected]
+    print(f"[INFO] Stand-in served {app['counters']['requests']} requests; {len(short)} stations returned fewer than {expected} readings")
+
+
+
+async def run_bulk(app: web.Application):
+    import fetch_latest
+
+    runner = await start_standin(app)
+    now = datetime.now(timezone.utc)
+
+    def stamp(dt: datetime) -> str:
+        return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    # Three gauges of the fixture an hour behind, one a day behind and one missing from the listing
+    latest_datetime_dict = {
+        "E70039": stamp(now - timedelta(hours=1)),
+        "E71539": stamp(now - timedelta(hours=1)),
+        "E72639": stamp(now - timedelta(hours=1)),
+        "E14660": stamp(now - timedelta(days=2)),
+        "E99999": stamp(now - timedelta(hours=1)),
+    }
+    try:
+        results = await fetch_latest.fetch_all_stations_bulk(latest_datetime_dict)
+    finally:
+        await runner.cleanup()
+
+    for result in results:
+        for notation, items in result.items():
+            print(f"[INFO] {notation}: {len(items)} readings")
+    print(f"[INFO] Stand-in served {app['counters']['requests']} requests for {len(latest_datetime_dict)} stations")
+
+
+async def record_fixture(hours: int):
+    import aiohttp
+    import fetch_latest
+
+    since = (datetime.now(timezone.utc) - timedelta(hours=hours)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    url = f"https://environment.data.gov.uk/flood-monitoring/data/readings?{fetch_latest.BULK_READINGS_FILTER}&since={since}&_sorted&_limit=10000"
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url) as res:
+            res.raise_for_status()
+            data = await res.json()
+
+    FIXTURE.parent.mkdir(exist_ok=True)
+    with open(FIXTURE, "w") as f:
+        json.dump(data, f, indent=1)
+    print(f"[INFO] Recorded {len(data.get('items', []))} readings to {FIXTURE}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    parser = argparse.ArgumentParser(description="Local stand-in for the EA readings API")
+    parser.add_argument("--serve", action="store_true", help="Only run the stand-in server")
+    parser.add_argument("--bulk", action="store_true", help="Exercise the bulk ingest mode")
+    parser.add_argument("--record", action="store_true", help="Record the bulk fixture from the real API")
+    parser.add_argument("--hours", type=int, default=6, help="Hours of readings to record")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.05, help="Base response latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Fraction of requests answered with 503")
+    parser.add_argument("--capacity", type=int, default=8, help="Concurrent requests before answering 429")
+    parser.add_argument("--stations", type=int, default=40)
+    parser.add_argument("--days", type=int, default=14, help="Days of readings to fetch per station")
+    args = parser.parse_args()
+
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+    app = make_app(args.latency, args.error_rate, args.capacity)
+    if args.record:
+        asyncio.run(record_fixture(args.hours))
+    elif args.serve:
+        web.run_app(app, host="127.0.0.1", port=args.port)
+    elif args.bulk:
+        asyncio.run(run_bulk(app))
+    else:
+        asyncio.run(run_fetch(args.stations, args.days, app))
@@ -1,6 +1,7 @@
 # ====================== Models ================================ #
-from datetime import datetime
-from sqlalchemy import Float, DateTime, String, ForeignKey, UniqueConstraint
+from datetime import date, datetime
+from sqlalchemy import JSON, Date, Float, DateTime, Index, Integer, LargeBinary, String, ForeignKey, UniqueConstraint
+from sqlalchemy.dialects.postgresql import BIT
 from sqlalchemy.orm import declarative_base, Mapped, mapped_column
 
 Base = declarative_base()
@@ -30,6 +31,70 @@ class Reading(Base):
     
     __table_args__ = (
         UniqueConstraint('station_id', 'date_time', name='uq_station_datetime'),
+        # Index-only scans of the API queries, and range scans across stations (see add_indexes.py)
+        Index('ix_readings_station_time_value', 'station_id', 'date_time', postgresql_include=['value']),
+        Index('ix_readings_date_time_brin', 'date_time', postgresql_using='brin', postgresql_with={'pages_per_range': 32}),
     )
 
+
+class SurgeEvent(Base):
+    """A run of consecutive readings whose surge (observed - astronomical) exceeds the index threshold."""
+    __tablename__ = "surge_events"
+    
+    station_id: Mapped[int] = mapped_column(ForeignKey("stations.station_id", ondelete="CASCADE"), primary_key=True)
+    start_time: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    end_time: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    peak_time: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    peak_surge: Mapped[float] = mapped_column(Float, index=True)
+    threshold: Mapped[float] = mapped_column(Float)
+
+
+class SurgeIndexState(Base):
+    """Per station watermark of the readings already scanned into surge_events."""
+    __tablename__ = "surge_index_state"
+    
+    station_id: Mapped[int] = mapped_column(ForeignKey("stations.station_id", ondelete="CASCADE"), primary_key=True)
+    processed_until: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+
+class StationCoverage(Base):
+    """Hourly coverage bitmap of a station's readings for one UTC month (bit i set = a reading in hour i)."""
+    __tablename__ = "station_coverage"
+    
+    station_id: Mapped[int] = mapped_column(ForeignKey("stations.station_id", ondelete="CASCADE"), primary_key=True)
+    month: Mapped[date] = mapped_column(Date, primary_key=True)
+    bits: Mapped[str] = mapped_column(BIT(744))
+
+
+class SurgeReturnLevels(Base):
+    """Extreme value fit of a station's surge and its return levels (see db_scripts/surge_return_levels.py)."""
+    __tablename__ = "surge_return_levels"
+    
+    station_id: Mapped[int] = mapped_column(ForeignKey("stations.station_id", ondelete="CASCADE"), primary_key=True)
+    method: Mapped[str] = mapped_column(String(10))  # gev (block maxima) or gpd (peaks over threshold)
+    block: Mapped[str | None] = mapped_column(String(10), nullable=True)  # year or month, for gev
+    loc: Mapped[float | None] = mapped_column(Float, nullable=True)
+    scale: Mapped[float] = mapped_column(Float)
+    shape: Mapped[float] = mapped_column(Float)  # xi, positive for a heavy tail
+    threshold: Mapped[float | None] = mapped_column(Float, nullable=True)  # gpd
+    rate: Mapped[float | None] = mapped_column(Float, nullable=True)  # gpd peaks per year
+    samples: Mapped[int] = mapped_column(Integer)
+    years: Mapped[float] = mapped_column(Float)
+    levels: Mapped[dict] = mapped_column(JSON)  # return period (years) -> surge (m)
+    record_start: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    record_end: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    fitted_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+
+class ReadingsHighRes(Base):
+    """Full-rate readings of a station for one UTC day, delta-encoded and compressed (see app/internal/highres.py)."""
+    __tablename__ = "readings_highres"
+    
+    station_id: Mapped[int] = mapped_column(ForeignKey("stations.station_id", ondelete="CASCADE"), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer)
+    quantum: Mapped[float] = mapped_column(Float)
+    times: Mapped[bytes] = mapped_column(LargeBinary)
+    values: Mapped[bytes] = mapped_column(LargeBinary)
+
 # ====================== Models ================================ #
@@ -0,0 +1,53 @@
+#!/bin/bash
+
+# Run the long-running ingest daemon (replaces the hourly run_pipeline.sh cron job)
+
+set -e
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+cd "$SCRIPT_DIR"
+
+# Setup logging
+LOGS_DIR="$SCRIPT_DIR/logs"
+mkdir -p "$LOGS_DIR"
+LOG_FILE="$LOGS_DIR/ingest_daemon_$(date +%Y%m%d_%H%M%S).log"
+
+# Redirect all output to log file and console with line buffering for real-time tail -f
+exec > >(stdbuf -oL tee -a "$LOG_FILE")
+exec 2>&1
+
+# Remove logs older than 5 days
+find "$LOGS_DIR" -name "ingest_daemon_*.log" -type f -mtime +5 -delete
+
+# Activate virtual environment
+if [ -f "$SCRIPT_DIR/.venv/bin/activate" ]; then
+    echo "Activating virtual environment..."
+    source "$SCRIPT_DIR/.venv/bin/activate"
+else
+    echo "ERROR: Virtual environment not found at $SCRIPT_DIR/.venv"
+    exit 1
+fi
+
+# Load environment variables
+if [ -f "$SCRIPT_DIR/.env" ]; then
+    echo "Loading .env file..."
+    export $(cat "$SCRIPT_DIR/.env" | grep -v '#' | xargs)
+else
+    echo "ERROR: .env file not found at $SCRIPT_DIR/.env"
+    exit 1
+fi
+
+# Enable unbuffered Python output for real-time logging
+export PYTHONUNBUFFERED=1
+
+echo ""
+echo "=========================================="
+echo "  Ingest daemon"
+echo "=========================================="
+echo "Log file: $LOG_FILE"
+echo "Health file: ${INGEST_HEALTH_FILE:-$LOGS_DIR/ingest_health.json}"
+echo "=========================================="
+echo ""
+
+# exec so SIGTERM from the supervisor (systemd, docker) reaches the daemon for a graceful shutdown
+exec python ingest_daemon.py
@@ -50,7 +50,8 @@ echo ""
 
 echo "Fetching latest data..."
 echo "----------------------------------------"
-python fetch_latest.py
+# One readings listing for all gauges, stations lagging behind are fetched one by one
+python fetch_latest.py --mode bulk
 if [ $? -ne 0 ]; then
     echo "ERROR: fetch_latest.py failed"
     exit 1
@@ -59,7 +60,7 @@ echo ""
 
 echo "Checking DB for duplicates..."
 echo "----------------------------------------"
-python check_duplicates.py
+python readings_maintenance.py check
 DUPLICATES_FOUND=$?
 
 if [ $DUPLICATES_FOUND -eq 0 ]; then
@@ -71,16 +72,16 @@ elif [ $DUPLICATES_FOUND -eq 1 ]; then
     echo ""
     echo "Duplicates found. Removing duplicates..."
     echo "----------------------------------------"
-    python remove_duplicates.py
+    python readings_maintenance.py dedupe --resume
     if [ $? -ne 0 ]; then
-        echo "ERROR: remove_duplicates.py failed"
+        echo "ERROR: readings_maintenance.py dedupe failed"
         exit 1
     fi
     
     echo ""
     echo "Verifying duplicates were removed..."
     echo "----------------------------------------"
-    python check_duplicates.py
+    python readings_maintenance.py check --mode full
     if [ $? -eq 0 ]; then
         echo ""
         echo "✓ All duplicates removed. Finished."
@@ -92,6 +93,6 @@ elif [ $DUPLICATES_FOUND -eq 1 ]; then
         exit 1
     fi
 else
-    echo "ERROR: check_duplicates.py failed"
+    echo "ERROR: readings_maintenance.py check failed"
     exit 1
 fi
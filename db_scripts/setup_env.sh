@@ -10,7 +10,7 @@ source .venv/bin/activate
 
 echo "Installing dependencies..."
 pip install --upgrade pip
-pip install sqlalchemy[asyncio] aiohttp pendulum psycopg[binary] tqdm
+pip install sqlalchemy[asyncio] aiohttp pendulum psycopg[binary] tqdm numpy utide redis
 
 echo ""
 echo "✓ Environment setup complete!"
@@ -20,6 +20,9 @@ echo "  source .venv/bin/activate"
 echo ""
 echo "To run scripts:"
 echo "  python fetch_latest.py"
-echo "  python check_duplicates.py"
-echo "  python remove_duplicates.py"
+echo "  python readings_maintenance.py check"
+echo "  python readings_maintenance.py dedupe"
 echo "  python add_constraint.py"
+echo "  python surge_events.py"
+echo "  python ingest_daemon.py"
+echo "  python readings_coverage.py backfill"
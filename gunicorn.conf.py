@@ -0,0 +1,23 @@
+'''
+Gunicorn settings of the backend image.
+
+The app is imported once in the master (preload_app) and the static tide data is loaded there
+before the workers are forked, so every worker starts with it in (copy-on-write shared) memory.
+Each worker then only opens its own database and Redis connections during warm-up.
+'''
+import gc
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+worker_class = "uvicorn.workers.UvicornWorker"
+forwarded_allow_ips = "*"
+preload_app = True
+
+
+def when_ready(server):
+    from app.internal import tide_data
+
+    tide_data.preload()
+    # Keep the collector of the workers from touching (and so copying) the preloaded objects
+    gc.freeze()
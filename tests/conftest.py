@@ -0,0 +1,11 @@
+'''
+The app is imported as the `app` package from the repository root, and the db_scripts are imported
+by module name as they are run (python fetch_latest.py), so both directories go on the path.
+'''
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+for path in (ROOT, ROOT / "db_scripts"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
@@ -0,0 +1,38 @@
+import numpy as np
+
+from app.internal.correlation import lagged_correlation
+
+
+def series_pair(lag: int, n: int = 500) -> np.ndarray:
+    rng = np.random.default_rng(1)
+    base = rng.standard_normal(n + lag)
+    # The second station sees the same surge `lag` hours later
+    return np.vstack([base[lag:], base[:n]])
+
+
+def test_finds_the_lag_between_the_stations():
+    result = lagged_correlation(series_pair(3), max_lag=12)
+    assert result["best_lag"][0, 1] == 3
+    assert result["best_lag"][1, 0] == -3
+    assert result["best"][0, 1] > 0.999
+    assert abs(result["lag0"][0, 1]) < 0.2
+
+
+def test_matches_pearson_on_the_overlap():
+    series = series_pair(0)
+    series[1] += np.random.default_rng(2).standard_normal(series.shape[1])
+    series[0, 100:150] = np.nan
+    series[1, 300:320] = np.nan
+    both = ~np.isnan(series).any(axis=0)
+    expected = np.corrcoef(series[0, both], series[1, both])[0, 1]
+    result = lagged_correlation(series, max_lag=0)
+    assert np.isclose(result["lag0"][0, 1], expected)
+    assert result["overlap"][0, 1] == both.sum()
+
+
+def test_too_little_overlap_is_nan():
+    series = series_pair(0, n=100)
+    series[0, 20:] = np.nan
+    result = lagged_correlation(series, max_lag=2, min_overlap=24)
+    assert np.isnan(result["lag0"][0, 1])
+    assert np.isnan(result["best"][0, 1])
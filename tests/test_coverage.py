@@ -0,0 +1,40 @@
+from datetime import date
+
+import numpy as np
+
+from app.internal.coverage import MONTH_BITS, coverage_mask, gaps, month_starts
+
+
+def bits(hours_set, month_hours: int) -> str:
+    return "".join("1" if h in hours_set else "0" for h in range(month_hours)) + "0" * (MONTH_BITS - month_hours)
+
+
+def test_month_starts_cover_the_window():
+    assert month_starts(np.datetime64("2026-01-31T23", "h"), np.datetime64("2026-03-01T00", "h")) == [date(2026, 1, 1), date(2026, 2, 1)]
+    assert month_starts(np.datetime64("2026-02-01T00", "h"), np.datetime64("2026-02-01T01", "h")) == [date(2026, 2, 1)]
+
+
+def test_mask_across_a_short_month():
+    # February 2026 has 672 hours, the bits after them are unused
+    february = bits({0, 671}, 672)[:672] + "1" * (MONTH_BITS - 672)
+    march = bits({0, 1}, 744)
+    hours, covered = coverage_mask(
+        [(date(2026, 2, 1), february), (date(2026, 3, 1), march)],
+        np.datetime64("2026-02-28T22", "h"), np.datetime64("2026-03-01T03", "h"),
+    )
+    assert hours[0] == np.datetime64("2026-02-28T22", "h")
+    np.testing.assert_array_equal(covered, [False, True, True, True, False])
+
+
+def test_months_without_a_row_are_not_covered():
+    hours, covered = coverage_mask([], np.datetime64("2026-05-01T00", "h"), np.datetime64("2026-05-01T05", "h"))
+    assert hours.size == 5 and not covered.any()
+
+
+def test_gaps_are_half_open_runs():
+    hours = np.arange(np.datetime64("2026-05-01T00", "h"), np.datetime64("2026-05-01T06", "h"))
+    covered = np.array([True, False, False, True, True, False])
+    assert gaps(hours, covered) == [
+        (np.datetime64("2026-05-01T01", "h"), np.datetime64("2026-05-01T03", "h")),
+        (np.datetime64("2026-05-01T05", "h"), np.datetime64("2026-05-01T06", "h")),
+    ]
@@ -0,0 +1,65 @@
+import asyncio
+from datetime import date
+
+import numpy as np
+import pendulum
+
+from app.api.endpoints.data import fetch_highres_readings
+from app.internal import highres
+from app.models import Reading
+
+
+class FakeConnection:
+    '''
+    Answers the full-rate tier query with fixed readings_highres rows
+    '''
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def execute(self, *args, **kwargs):
+        rows = self.rows
+
+        class Result:
+            def mappings(self):
+                return self
+
+            def all(self):
+                return rows
+
+        return Result()
+
+
+def highres_row(day: date, seconds, values) -> dict:
+    times, blob = highres.encode(np.array(seconds), np.array(values))
+    return {"day": day, "count": len(seconds), "quantum": highres.QUANTUM, "times": times, "values": blob, "station_id": 1, "station_label": "Plymouth"}
+
+
+def hourly(day: str, hours) -> list:
+    return [Reading(date_time=pendulum.parse(f"{day}T{hour:02d}:00:00Z"), value=float(hour), station_id=1, station_label="Plymouth") for hour in hours]
+
+
+def test_a_partly_covered_day_keeps_the_hours_the_tier_lacks():
+    # The tier starts at 06:00 (ingest switched on mid-day) and has a gap from 12:00 to 15:00
+    seconds = [h * 3600 + m * 60 for h in range(6, 24) for m in (0, 15, 30, 45) if not 12 <= h < 15 or (h, m) == (12, 0)]
+    row = highres_row(date(2026, 5, 1), seconds, [0.5] * len(seconds))
+    readings = hourly("2026-05-01", range(24))
+    start, end = pendulum.datetime(2026, 5, 1), pendulum.datetime(2026, 5, 1, 23, 59)
+
+    merged = asyncio.run(fetch_highres_readings(FakeConnection([row]), "Plymouth", start, end, readings))
+
+    kept = [r.date_time.hour for r in merged if r.value != 0.5]
+    assert kept == [0, 1, 2, 3, 4, 5, 13, 14]
+    assert sum(r.value == 0.5 for r in merged) == len(seconds)
+    times = [r.date_time for r in merged]
+    assert times == sorted(times) and len(set(times)) == len(times)
+
+
+def test_runs_continue_across_midnight():
+    late = highres_row(date(2026, 5, 1), [23 * 3600 + 45 * 60], [0.5])
+    early = highres_row(date(2026, 5, 2), [0, 15 * 60, 30 * 60], [0.5] * 3)
+    readings = hourly("2026-05-02", [0, 1])
+    start, end = pendulum.datetime(2026, 5, 1, 23), pendulum.datetime(2026, 5, 2, 2)
+
+    merged = asyncio.run(fetch_highres_readings(FakeConnection([late, early]), "Plymouth", start, end, readings))
+
+    assert [(r.date_time.hour, r.value) for r in merged if r.value != 0.5] == [(1, 1.0)]
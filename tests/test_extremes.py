@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from app.internal import extremes
+
+GEV_YEAR = {"method": "gev", "block": "year", "loc": 0.8, "scale": 0.15, "shape": 0.1, "threshold": None, "rate": None}
+GEV_MONTH = {**GEV_YEAR, "block": "month", "loc": 0.5}
+# Station of the coef_12_Plymouth.json coefficients
+PLYMOUTH_ID = 12
+
+GPD = {"method": "gpd", "block": None, "loc": None, "scale": 0.12, "shape": -0.1, "threshold": 0.6, "rate": 5.0}
+
+
+@pytest.mark.parametrize("fit", [GEV_YEAR, GEV_MONTH, GPD, {**GPD, "shape": 0.0}, {**GEV_YEAR, "shape": 0.0}])
+@pytest.mark.parametrize("years", [2, 10, 100])
+def test_return_level_and_period_round_trip(fit, years):
+    level = extremes.return_level(fit, years)
+    assert extremes.return_period(fit, level) == pytest.approx(years, rel=1e-6)
+
+
+def test_levels_grow_with_the_period():
+    for fit in (GEV_YEAR, GEV_MONTH, GPD):
+        levels = [extremes.return_level(fit, years) for years in extremes.RETURN_PERIODS]
+        assert levels == sorted(levels)
+
+
+def test_closed_forms_match_scipy():
+    stats = pytest.importorskip("scipy.stats")
+    for x in (0.5, 0.9, 1.4):
+        # The shape is minus scipy's c for the GEV, the same c for the GPD
+        assert extremes._gev_cdf(x, 0.8, 0.15, 0.1) == pytest.approx(stats.genextreme.cdf(x, -0.1, 0.8, 0.15))
+        assert extremes._gpd_sf(x - 0.4, 0.12, -0.1) == pytest.approx(stats.genpareto.sf(x - 0.4, -0.1, 0, 0.12), abs=1e-12)
+
+
+def test_below_the_gpd_threshold_has_no_return_period():
+    # Regression: a surge at or below the threshold came out as recurring every 1 / rate years
+    for level in (0.0, 0.3, GPD["threshold"]):
+        assert extremes.below_threshold(GPD, level)
+        assert extremes.annual_exceedance(GPD, level) is None
+        assert extremes.return_period(GPD, level) is None
+    assert not extremes.below_threshold(GPD, 0.61)
+    assert extremes.return_period(GPD, 0.61) > 1 / GPD["rate"]
+    assert not extremes.below_threshold(GEV_YEAR, 0.0)
+
+
+def test_beyond_a_bounded_tail_has_no_return_period():
+    bounded = {**GPD, "shape": -0.5}
+    upper_end = bounded["threshold"] + bounded["scale"] / 0.5
+    assert extremes.return_period(bounded, upper_end + 0.1) is None
+    assert not extremes.below_threshold(bounded, upper_end + 0.1)
+
+
+def test_gpd_period_shorter_than_the_peaks_has_no_level():
+    assert extremes.return_level(GPD, 0.1) is None
+
+
+def test_fit_station_on_synthetic_storms():
+    pytest.importorskip("scipy.stats")
+    from surge_events import load_station_terms
+    from surge_return_levels import PEAKS_PER_YEAR, fit_station
+    from app.internal.harmonics import predict
+
+    rng = np.random.default_rng(3)
+    times = np.arange(np.datetime64("2023-01-01T00", "h"), np.datetime64("2026-01-01T00", "h")).astype("datetime64[ns]")
+    surge = rng.normal(0, 0.02, times.size)
+    # A 12-hour storm every 5 days, with exponential peaks
+    for start in range(0, times.size - 12, 120):
+        surge[start:start + 13] += rng.exponential(0.3) * (1 - np.abs(np.arange(-6, 7)) / 6)
+    values = predict(load_station_terms(PLYMOUTH_ID), times) + surge
+    epochs = times.astype("datetime64[s]").astype(np.int64).astype(float)
+
+    fit = fit_station(PLYMOUTH_ID, epochs, values)
+    assert fit["method"] == "gpd"
+    assert fit["rate"] == pytest.approx(PEAKS_PER_YEAR, rel=0.1)
+    assert fit["levels"]["2"] > fit["threshold"]
+    assert extremes.return_period(fit, fit["levels"]["10"]) == pytest.approx(10, rel=0.01)
+    assert extremes.return_period(fit, 0.0) is None
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from fetch_latest import AdaptiveLimiter, backoff_delay
+
+
+def test_limiter_grows_one_slot_per_limit_fast_responses():
+    limiter = AdaptiveLimiter(initial=4, max_limit=32)
+    for _ in range(4):
+        limiter.record(0.1)
+    assert 4.9 < limiter.limit < 5.0
+
+
+def test_limiter_halves_once_per_round_trip():
+    limiter = AdaptiveLimiter(initial=16)
+    limiter.record(0.5, congested=True)
+    assert limiter.limit == 8
+    # The other responses of the same round trip report the same congestion
+    limiter.record(0.5, congested=True)
+    limiter.record(5.0)
+    assert limiter.limit == 8
+
+
+def test_limiter_stays_within_bounds():
+    limiter = AdaptiveLimiter(initial=2, min_limit=1, max_limit=3)
+    for _ in range(100):
+        limiter.record(0.1)
+    assert limiter.limit == 3
+    low = AdaptiveLimiter(initial=1, min_limit=1)
+    low.record(0.0, congested=True)
+    assert low.limit == 1
+
+
+def test_limiter_blocks_at_the_limit():
+    async def run():
+        limiter = AdaptiveLimiter(initial=2)
+        await limiter.__aenter__()
+        await limiter.__aenter__()
+        third = asyncio.create_task(limiter.__aenter__())
+        await asyncio.sleep(0.01)
+        assert not third.done()
+        await limiter.__aexit__(None, None, None)
+        await asyncio.wait_for(third, 1)
+        assert limiter.in_flight == 2
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("attempt", range(8))
+def test_backoff_delay_is_full_jitter_within_the_cap(attempt):
+    delays = [backoff_delay(attempt, base=0.5, cap=30.0) for _ in range(200)]
+    assert min(delays) >= 0
+    assert max(delays) <= min(30.0, 0.5 * 2 ** attempt)
+
+
+def test_backoff_delay_follows_retry_after():
+    assert backoff_delay(0, "7") == 7
+    assert backoff_delay(0, "120", cap=30.0) == 30.0
+    # An HTTP date isn't parsed, the exponential backoff applies
+    assert 0 <= backoff_delay(1, "Wed, 21 Oct 2026 07:28:00 GMT", base=0.5) <= 1.0
@@ -0,0 +1,30 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.internal.harmonics import harmonic_terms, predict
+from app.internal.utilities import json_to_utide_coef
+
+COEF_DIR = Path(__file__).resolve().parent.parent / "app" / "tide-data" / "coef"
+
+
+@pytest.fixture(scope="module", params=["coef_12_Plymouth.json", "coef_15_Liverpool.json"])
+def coef(request):
+    with open(COEF_DIR / request.param) as f:
+        return json_to_utide_coef(json.load(f))
+
+
+def test_predict_matches_utide_reconstruct(coef):
+    utide = pytest.importorskip("utide")
+    times = np.arange(np.datetime64("2025-03-01T00:00"), np.datetime64("2025-03-15T00:00"), np.timedelta64(10, "m"))
+    expected = utide.reconstruct(times.astype("datetime64[us]").tolist(), coef, verbose=False).h
+    # Within a millimetre, the nodal corrections being evaluated once a day
+    np.testing.assert_allclose(predict(harmonic_terms(coef), times), expected, atol=1e-3)
+
+
+def test_chunking_doesnt_change_the_prediction(coef):
+    terms = harmonic_terms(coef)
+    times = np.arange(np.datetime64("2024-01-01T00:00"), np.datetime64("2024-01-20T00:00"), np.timedelta64(15, "m"))
+    np.testing.assert_allclose(predict(terms, times, chunk=100), predict(terms, times), atol=1e-12)
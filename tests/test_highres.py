@@ -0,0 +1,50 @@
+import numpy as np
+
+from app.internal import highres
+
+
+def test_round_trip_is_lossless_to_the_quantum():
+    seconds = np.array([0, 900, 1800, 2700, 3605, 86399])
+    values = np.array([-3.215, -2.9, 0.0, 1.001, 4.567, -0.001])
+    times_blob, values_blob = highres.encode(seconds, values)
+    decoded_seconds, decoded_values = highres.decode(times_blob, values_blob, seconds.size)
+    np.testing.assert_array_equal(decoded_seconds, seconds)
+    np.testing.assert_array_equal(decoded_values, values)
+
+
+def test_values_are_rounded_to_the_quantum():
+    _, values = highres.decode(*highres.encode(np.array([0, 60]), np.array([1.23449, 1.23451])), 2)
+    np.testing.assert_array_equal(values, [1.234, 1.235])
+
+
+def test_a_regular_day_compresses_well():
+    seconds = np.arange(0, highres.SECONDS_PER_DAY, 900)
+    values = np.round(2 * np.sin(seconds / 44714 * 2 * np.pi), 3)
+    times_blob, values_blob = highres.encode(seconds, values)
+    assert len(times_blob) + len(values_blob) < seconds.size * 4
+
+
+def test_decode_of_an_empty_day():
+    seconds, values = highres.decode(b"", b"", 0)
+    assert seconds.size == 0 and values.size == 0
+
+
+def test_merge_sorts_and_prefers_the_new_reading():
+    seconds, values = highres.merge(np.array([0, 1800]), np.array([1.0, 2.0]), np.array([3600, 1800, 900]), np.array([4.0, 2.5, 1.5]))
+    np.testing.assert_array_equal(seconds, [0, 900, 1800, 3600])
+    np.testing.assert_array_equal(values, [1.0, 1.5, 2.5, 4.0])
+
+
+def test_runs_split_at_gaps_of_an_hour():
+    times = np.array(["2026-05-01T10:00", "2026-05-01T10:15", "2026-05-01T10:30", "2026-05-01T11:30", "2026-05-01T11:45"], dtype="datetime64[s]")
+    starts, ends = highres.runs(times)
+    np.testing.assert_array_equal(starts, times[[0, 3]])
+    np.testing.assert_array_equal(ends, times[[2, 4]])
+
+
+def test_covered_by_the_runs():
+    starts = np.array(["2026-05-01T10:00", "2026-05-01T12:00"], dtype="datetime64[s]")
+    ends = np.array(["2026-05-01T11:00", "2026-05-01T12:00"], dtype="datetime64[s]")
+    times = np.array(["2026-05-01T09:00", "2026-05-01T10:00", "2026-05-01T11:00", "2026-05-01T11:30", "2026-05-01T12:00", "2026-05-01T13:00"], dtype="datetime64[s]")
+    np.testing.assert_array_equal(highres.covered(times, starts, ends), [False, True, True, False, True, False])
+    assert not highres.covered(times, starts[:0], ends[:0]).any()
@@ -0,0 +1,34 @@
+from app.internal.spatial import StationIndex
+
+STATIONS = [
+    (1, "Plymouth", 50.37, -4.19),
+    (2, "Dover", 51.11, 1.32),
+    (3, "Aberdeen", 57.14, -2.08),
+    (4, "Suva", -18.13, 178.43),
+    (5, "Apia", -13.83, -171.76),
+]
+
+
+def index() -> StationIndex:
+    station_index = StationIndex()
+    station_index.build("v1", STATIONS)
+    return station_index
+
+
+def test_within_a_box():
+    assert index().within(-5, 50, 2, 52) == [(2, "Dover"), (1, "Plymouth")]
+    assert index().within(-5, 52, 2, 55) == []
+
+
+def test_within_a_box_across_the_antimeridian():
+    assert index().within(170, -20, -170, -10) == [(5, "Apia"), (4, "Suva")]
+
+
+def test_within_the_whole_world():
+    assert len(index().within(-180, -90, 180, 90)) == len(STATIONS)
+
+
+def test_nearest_are_sorted_by_distance():
+    nearest = index().nearest(50.5, -3.5, 2)
+    assert [label for _, label, _ in nearest] == ["Plymouth", "Dover"]
+    assert 40 < nearest[0][2] < 60